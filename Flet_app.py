@@ -2,17 +2,65 @@
 通话详单查看器 - 主程序
 一比一复刻中国联通通话记录界面
 """
-import flet as ft
-import flet.canvas as cv
-from database import CallLogDatabase
-from datetime import datetime
-import time
-import math
-import base64
+from startup_profiler import profiler
 
+# 启动分析开启时记录各模块的导入耗时
+with profiler.phase("flet", "import"):
+    import flet as ft
+with profiler.phase("flet.canvas", "import"):
+    import flet.canvas as cv
+with profiler.phase("database", "import"):
+    from database import (
+        PAGE_SIZE, DEFAULT_ORDER, SORT_ORDERS, UNDO_WINDOW, empty_changes, log_sort_key, merge_changes,
+        prepare_log, shared_database,
+    )
+with profiler.phase("importer/exporter", "import"):
+    from importer import import_bill
+    from exporter import export_logs, EXPORT_FORMATS
+with profiler.phase("stdlib", "import"):
+    from datetime import datetime
+    import time
+    import asyncio
+    import logging
+    import math
+    import functools
+    import bisect
+    import calendar
+    import threading
 
-def create_star_canvas(size=24, color="#000000", stroke_width=2.5):
-    """创建五角星Canvas"""
+
+logger = logging.getLogger("call_log")
+
+
+# 图形几何缓存上限 (按全部参数缓存, LRU淘汰)
+SHAPE_CACHE_SIZE = 64
+
+
+def build_canvas(shape_specs, width, height):
+    """根据缓存的图形描述创建Canvas
+
+    图形描述为 (图形类, 参数) 元组; 路径点和Paint只计算一次并在多次调用间共享,
+    控件本身不能挂在多个父节点下, 所以每次调用都新建。
+    """
+    return cv.Canvas(
+        [shape_cls(**kwargs) for shape_cls, kwargs in shape_specs],
+        width=width,
+        height=height
+    )
+
+
+def polyline_elements(points, close=False):
+    """将点序列转换为路径元素 (MoveTo + LineTo...)"""
+    elements = [cv.Path.MoveTo(points[0][0], points[0][1])]
+    elements.extend(cv.Path.LineTo(x, y) for x, y in points[1:])
+    if close:
+        elements.append(cv.Path.Close())
+    return elements
+
+
+@functools.lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def star_shape_specs(size, color, stroke_width):
+    """五角星图形描述"""
     # 计算五角星的顶点坐标
     center_x, center_y = size / 2, size / 2
     outer_radius = size * 0.4
@@ -26,62 +74,60 @@ def create_star_canvas(size=24, color="#000000", stroke_width=2.5):
         y = center_y + radius * math.sin(angle)
         points.append((x, y))
     
-    # 创建路径
-    path_elements = [cv.Path.MoveTo(points[0][0], points[0][1])]
-    for i in range(1, len(points)):
-        path_elements.append(cv.Path.LineTo(points[i][0], points[i][1]))
-    path_elements.append(cv.Path.Close())
-    
-    return cv.Canvas(
-        [
-            cv.Path(
-                path_elements,
-                paint=ft.Paint(
-                    stroke_width=stroke_width,
-                    style=ft.PaintingStyle.STROKE,
-                    color=color,
-                    stroke_cap=ft.StrokeCap.ROUND,
-                    stroke_join=ft.StrokeJoin.ROUND
-                )
+    return (
+        (cv.Path, dict(
+            elements=polyline_elements(points, close=True),
+            paint=ft.Paint(
+                stroke_width=stroke_width,
+                style=ft.PaintingStyle.STROKE,
+                color=color,
+                stroke_cap=ft.StrokeCap.ROUND,
+                stroke_join=ft.StrokeJoin.ROUND
             )
-        ],
-        width=size,
-        height=size
+        )),
     )
 
 
-def create_arrow_canvas(size=22, color="#000000", stroke_width=2.5):
-    """创建返回箭头Canvas"""
+def create_star_canvas(size=24, color="#000000", stroke_width=2.5):
+    """创建五角星Canvas"""
+    return build_canvas(star_shape_specs(size, color, stroke_width), width=size, height=size)
+
+
+@functools.lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def arrow_shape_specs(size, color, stroke_width):
+    """返回箭头图形描述"""
     # 箭头路径: < 形状
     center_y = size / 2
     start_x = size * 0.6
     end_x = size * 0.3
     arrow_height = size * 0.4
     
-    return cv.Canvas(
-        [
-            cv.Path(
-                [
-                    cv.Path.MoveTo(start_x, center_y - arrow_height),
-                    cv.Path.LineTo(end_x, center_y),
-                    cv.Path.LineTo(start_x, center_y + arrow_height),
-                ],
-                paint=ft.Paint(
-                    stroke_width=stroke_width,
-                    style=ft.PaintingStyle.STROKE,
-                    color=color,
-                    stroke_cap=ft.StrokeCap.ROUND,
-                    stroke_join=ft.StrokeJoin.ROUND
-                )
+    return (
+        (cv.Path, dict(
+            elements=polyline_elements([
+                (start_x, center_y - arrow_height),
+                (end_x, center_y),
+                (start_x, center_y + arrow_height),
+            ]),
+            paint=ft.Paint(
+                stroke_width=stroke_width,
+                style=ft.PaintingStyle.STROKE,
+                color=color,
+                stroke_cap=ft.StrokeCap.ROUND,
+                stroke_join=ft.StrokeJoin.ROUND
             )
-        ],
-        width=size,
-        height=size
+        )),
     )
 
 
-def create_fingerprint_pattern(width=350, height=100):
-    """创建指纹纹路装饰图案 - 真正的损失函数(双曲线)曲线族"""
+def create_arrow_canvas(size=22, color="#000000", stroke_width=2.5):
+    """创建返回箭头Canvas"""
+    return build_canvas(arrow_shape_specs(size, color, stroke_width), width=size, height=size)
+
+
+@functools.lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def fingerprint_shape_specs(width, height):
+    """指纹纹路图形描述 - 真正的损失函数(双曲线)曲线族"""
     shapes = []
     
     # 使用双曲线 y = k/x 的形状 (L型)
@@ -93,15 +139,12 @@ def create_fingerprint_pattern(width=350, height=100):
     # "最里面的线条在最右上角" -> i=0时 k最大
     # "往左下角扩散" -> i增大时 k减小
     
-    num_lines = 18
-    
-    # 调整参数以适应 350x100 的画布
-    # 画布左下角是 (0, 100)
-    
-    origin_x = 0
     origin_y = height + 10 # 上移原点(原+40)，让曲线底部往上收
     
     num_lines = 22 
+    points_count = 60
+    # 每条曲线共用同一组采样比例 j / points_count
+    ratios = [j / points_count for j in range(points_count + 1)]
     
     for i in range(num_lines):
         # i=0 (最里/右上): k大
@@ -124,60 +167,43 @@ def create_fingerprint_pattern(width=350, height=100):
         opacity = 0.03 + 0.03 * progress 
         stroke = 0.6 + 0.1 * (1 - progress)
         
-        # 生成路径点
-        path_elements = []
-        points_count = 60
-        
         # x的范围
         x_at_top = k / origin_y
         start_x = max(0, x_at_top) 
         end_x = width + 80 # 延伸更远
+        span_x = end_x - start_x
         
-        first_point = True
-        valid_points = 0
+        # 生成路径点, 宽容的边界检查
+        xs = [start_x + span_x * ratio for ratio in ratios]
+        points = [
+            (x, screen_y)
+            for x, screen_y in ((x, origin_y - k / x) for x in xs if x > 0)
+            if -50 <= screen_y <= height + 50
+        ]
         
-        for j in range(points_count + 1):
-            curr_x = start_x + (end_x - start_x) * (j / points_count)
-            
-            if curr_x > 0:
-                curve_y = k / curr_x
-            else:
-                continue
-                
-            screen_y = origin_y - curve_y
-            
-            # 宽容的边界检查
-            if -50 <= screen_y <= height + 50:
-                if first_point:
-                    path_elements.append(cv.Path.MoveTo(curr_x, screen_y))
-                    first_point = False
-                else:
-                    path_elements.append(cv.Path.LineTo(curr_x, screen_y))
-                valid_points += 1
-        
-        if valid_points > 1:
-            shapes.append(
-                cv.Path(
-                    path_elements,
-                    paint=ft.Paint(
-                        color=ft.Colors.with_opacity(opacity, ft.Colors.WHITE),
-                        stroke_width=stroke,
-                        style=ft.PaintingStyle.STROKE,
-                        stroke_cap=ft.StrokeCap.ROUND,
-                        stroke_join=ft.StrokeJoin.ROUND
-                    )
+        if len(points) > 1:
+            shapes.append((cv.Path, dict(
+                elements=polyline_elements(points),
+                paint=ft.Paint(
+                    color=ft.Colors.with_opacity(opacity, ft.Colors.WHITE),
+                    stroke_width=stroke,
+                    style=ft.PaintingStyle.STROKE,
+                    stroke_cap=ft.StrokeCap.ROUND,
+                    stroke_join=ft.StrokeJoin.ROUND
                 )
-            )
+            )))
     
-    return cv.Canvas(
-        shapes,
-        width=width,
-        height=height
-    )
+    return tuple(shapes)
 
 
-def create_calendar_icon(size, color, bg_color):
-    """绘制自定义日历图标"""
+def create_fingerprint_pattern(width=350, height=100):
+    """创建指纹纹路装饰图案"""
+    return build_canvas(fingerprint_shape_specs(width, height), width=width, height=height)
+
+
+@functools.lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def calendar_shape_specs(size, color, bg_color):
+    """日历图标图形描述"""
     border_width = 1.5  # 边框细一点
     content_width = 2.2 # 耳朵和横线粗一点
     
@@ -188,96 +214,75 @@ def create_calendar_icon(size, color, bg_color):
     box_top = size * 0.25
     box_height = size * 0.75
     
-    shapes.append(
-        cv.Rect(
-            x=size * 0.1,
-            y=box_top,
-            width=size * 0.8,
-            height=box_height,
-            border_radius=4,
-            paint=ft.Paint(
-                color=bg_color, # 填充浅粉色
-                style=ft.PaintingStyle.FILL,
-            )
+    shapes.append((cv.Rect, dict(
+        x=size * 0.1,
+        y=box_top,
+        width=size * 0.8,
+        height=box_height,
+        border_radius=4,
+        paint=ft.Paint(
+            color=bg_color, # 填充浅粉色
+            style=ft.PaintingStyle.FILL,
         )
-    )
+    )))
     
     # 边框
-    shapes.append(
-        cv.Rect(
-            x=size * 0.1,
-            y=box_top,
-            width=size * 0.8,
-            height=box_height,
-            border_radius=4,
-            paint=ft.Paint(
-                color=color,
-                stroke_width=border_width, # 边框细一点
-                style=ft.PaintingStyle.STROKE,
-            )
+    shapes.append((cv.Rect, dict(
+        x=size * 0.1,
+        y=box_top,
+        width=size * 0.8,
+        height=box_height,
+        border_radius=4,
+        paint=ft.Paint(
+            color=color,
+            stroke_width=border_width, # 边框细一点
+            style=ft.PaintingStyle.STROKE,
         )
-    )
+    )))
     
     # 2. 顶部两个耳朵 (竖线)
     ear_height = size * 0.2
     ear_y_start = size * 0.15
+    # 耳朵和横线使用同一支画笔 (粗一点)
+    content_paint = ft.Paint(
+        color=color,
+        stroke_width=content_width,
+        style=ft.PaintingStyle.STROKE,
+        stroke_cap=ft.StrokeCap.ROUND
+    )
     
     for x_pos in [size * 0.3, size * 0.7]:
-        shapes.append(
-            cv.Path(
-                [
-                    cv.Path.MoveTo(x_pos, ear_y_start),
-                    cv.Path.LineTo(x_pos, ear_y_start + ear_height)
-                ],
-                paint=ft.Paint(
-                    color=color,
-                    stroke_width=content_width, # 耳朵粗一点
-                    style=ft.PaintingStyle.STROKE,
-                    stroke_cap=ft.StrokeCap.ROUND
-                )
-            )
-        )
+        shapes.append((cv.Path, dict(
+            elements=polyline_elements([(x_pos, ear_y_start), (x_pos, ear_y_start + ear_height)]),
+            paint=content_paint
+        )))
         
     # 3. 中间横线 (一长一短)
     # 长横线
     line1_y = box_top + box_height * 0.35
-    shapes.append(
-        cv.Path(
-            [
-                cv.Path.MoveTo(size * 0.25, line1_y),
-                cv.Path.LineTo(size * 0.75, line1_y)
-            ],
-            paint=ft.Paint(
-                color=color,
-                stroke_width=content_width, # 横线粗一点
-                style=ft.PaintingStyle.STROKE,
-                stroke_cap=ft.StrokeCap.ROUND
-            )
-        )
-    )
+    shapes.append((cv.Path, dict(
+        elements=polyline_elements([(size * 0.25, line1_y), (size * 0.75, line1_y)]),
+        paint=content_paint
+    )))
     
     # 短横线
     line2_y = box_top + box_height * 0.65
-    shapes.append(
-        cv.Path(
-            [
-                cv.Path.MoveTo(size * 0.25, line2_y),
-                cv.Path.LineTo(size * 0.55, line2_y)
-            ],
-            paint=ft.Paint(
-                color=color,
-                stroke_width=content_width, # 横线粗一点
-                style=ft.PaintingStyle.STROKE,
-                stroke_cap=ft.StrokeCap.ROUND
-            )
-        )
-    )
+    shapes.append((cv.Path, dict(
+        elements=polyline_elements([(size * 0.25, line2_y), (size * 0.55, line2_y)]),
+        paint=content_paint
+    )))
 
-    return cv.Canvas(shapes, width=size, height=size)
+    return tuple(shapes)
 
 
-def create_search_icon(size, color, stroke_width=2.0):
-    """绘制自定义放大镜图标: 大圈短柄"""
+def create_calendar_icon(size, color, bg_color):
+    """绘制自定义日历图标"""
+    return build_canvas(calendar_shape_specs(size, color, bg_color), width=size, height=size)
+
+
+@functools.lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def search_shape_specs(size, color, stroke_width):
+    """放大镜图标图形描述"""
     # 圈
     radius = size * 0.35
     center_x = size * 0.4
@@ -290,9 +295,9 @@ def create_search_icon(size, color, stroke_width=2.0):
     handle_end_x = handle_start_x + handle_length
     handle_end_y = handle_start_y + handle_length
     
-    shapes = [
+    return (
         # 圈
-        cv.Circle(
+        (cv.Circle, dict(
             x=center_x,
             y=center_y,
             radius=radius,
@@ -301,103 +306,77 @@ def create_search_icon(size, color, stroke_width=2.0):
                 stroke_width=stroke_width,
                 color=color
             )
-        ),
+        )),
         # 柄
-        cv.Path(
-            [
-                cv.Path.MoveTo(handle_start_x, handle_start_y),
-                cv.Path.LineTo(handle_end_x, handle_end_y)
-            ],
+        (cv.Path, dict(
+            elements=polyline_elements([(handle_start_x, handle_start_y), (handle_end_x, handle_end_y)]),
             paint=ft.Paint(
                 style=ft.PaintingStyle.STROKE,
                 stroke_width=stroke_width,
                 color=color,
                 stroke_cap=ft.StrokeCap.ROUND
             )
-        )
-    ]
-    
-    return cv.Canvas(shapes, width=size, height=size)
+        )),
+    )
 
 
-def create_phone_icon(size, color, is_outgoing=True):
-    """绘制自定义空心话筒图标 (带箭头区分主叫/被叫)"""
-    # 使用新的SVG路径
-    svg_content = """<svg t="1764858099888" class="icon" viewBox="0 0 1024 1024" version="1.1" xmlns="http://www.w3.org/2000/svg" p-id="5925" width="200" height="200"><path d="M217.856 94.677333c-36.608 14.762667-60.928 38.485333-96.597333 83.2-88.618667 111.232-9.386667 332.8 194.730666 535.210667l10.581334 10.368c192 184.576 434.986667 264.533333 527.701333 184.064l3.029333-2.816-1.450666 1.194667a249.301333 249.301333 0 0 0 64.042666-77.994667c33.152-64 24.149333-130.858667-41.173333-182.954667-94.037333-75.008-157.184-77.568-219.434667-20.48l-6.997333 6.570667-18.005333 17.834667c-7.808-1.621333-19.882667-7.338667-34.730667-16.896-29.610667-19.114667-66.517333-50.901333-108.586667-92.586667-41.941333-41.642667-74.069333-78.208-93.312-107.605333l-3.882666-6.101334a120.448 120.448 0 0 1-12.245334-24.832l-0.938666-3.413333 18.133333-17.92 6.613333-6.954667c57.472-61.738667 54.912-124.373333-20.650666-217.642666-51.328-63.36-109.653333-83.328-166.826667-60.245334z m99.925333 113.493334l11.221334 14.08c37.546667 48.682667 37.888 64.853333 16.384 89.258666l-8.32 8.874667-21.12 20.821333c-45.482667 45.056-25.258667 102.314667 41.856 181.205334l14.08 16.085333 15.232 16.682667 8.106666 8.533333 16.981334 17.621333 18.176 18.261334 9.258666 9.130666 18.090667 17.450667 17.408 16.298667c5.717333 5.205333 11.306667 10.24 16.810667 15.104l16.213333 13.909333c79.616 66.56 137.216 86.570667 182.698667 41.685333l21.034666-20.992 5.546667-5.248c24.277333-22.186667 39.296-25.301333 80.725333 3.968l12.586667 9.258667 14.250667 11.093333c31.232 24.917333 34.261333 47.573333 18.602666 77.781334a165.845333 165.845333 0 0 1-26.88 36.608l-7.253333 7.338666-5.546667 5.12-5.333333 4.650667c-14.421333 14.293333-69.888 15.658667-141.184-7.722667-90.709333-29.781333-189.994667-92.074667-280.746667-182.101333-177.109333-175.658667-241.408-355.413333-188.16-422.272 26.453333-33.194667 43.648-49.92 61.653334-57.173333 19.285333-7.808 38.570667-1.194667 67.626666 34.688z" fill="#000000" p-id="5926"></path></svg>"""
-    
-    svg_b64 = base64.b64encode(svg_content.encode('utf-8')).decode('utf-8')
-    
-    handset_image = ft.Image(
-        src_base64=svg_b64,
+def create_search_icon(size, color, stroke_width=2.0):
+    """绘制自定义放大镜图标: 大圈短柄"""
+    return build_canvas(search_shape_specs(size, color, stroke_width), width=size, height=size)
+
+
+# 话筒SVG路径 (viewBox 0 0 1024 1024, 坐标保留一位小数以减小每行图标的传输大小)
+PHONE_HANDSET_PATH = "M217.9 94.7c-36.6 14.8-60.9 38.5-96.6 83.2-88.6 111.2-9.4 332.8 194.7 535.2l10.6 10.4c192 184.6 435 264.5 527.7 184.1l3-2.8-1.5 1.2a249.3 249.3 0 0 0 64-78c33.2-64 24.1-130.9-41.2-183-94-75-157.2-77.6-219.4-20.5l-7 6.6-18 17.8c-7.8-1.6-19.9-7.3-34.7-16.9-29.6-19.1-66.5-50.9-108.6-92.6-41.9-41.6-74.1-78.2-93.3-107.6l-3.9-6.1a120.4 120.4 0 0 1-12.2-24.8l-0.9-3.4 18.1-17.9 6.6-7c57.5-61.7 54.9-124.4-20.7-217.6-51.3-63.4-109.7-83.3-166.8-60.2z m99.9 113.5l11.2 14.1c37.5 48.7 37.9 64.9 16.4 89.3l-8.3 8.9-21.1 20.8c-45.5 45.1-25.3 102.3 41.9 181.2l14.1 16.1 15.2 16.7 8.1 8.5 17 17.6 18.2 18.3 9.3 9.1 18.1 17.5 17.4 16.3c5.7 5.2 11.3 10.2 16.8 15.1l16.2 13.9c79.6 66.6 137.2 86.6 182.7 41.7l21-21 5.5-5.2c24.3-22.2 39.3-25.3 80.7 4l12.6 9.3 14.3 11.1c31.2 24.9 34.3 47.6 18.6 77.8a165.8 165.8 0 0 1-26.9 36.6l-7.3 7.3-5.5 5.1-5.3 4.7c-14.4 14.3-69.9 15.7-141.2-7.7-90.7-29.8-190-92.1-280.7-182.1-177.1-175.7-241.4-355.4-188.2-422.3 26.5-33.2 43.6-49.9 61.7-57.2 19.3-7.8 38.6-1.2 67.6 34.7z"
+
+# 箭头线段 (基于24网格): 主叫箭头从话筒顶部水平指向右边, 被叫箭头从右上指向话筒中心
+PHONE_ARROW_POLYLINES = {
+    True: (
+        ((15, 6), (24, 6)),               # 箭身: 顶部，左移
+        ((20, 3), (24, 6), (20, 9)),      # 箭头头 (在右端): 上翼 -> 尖端 -> 下翼
+    ),
+    False: (
+        ((20, 2), (13, 9)),               # 箭身: 起点(右上) -> 终点(指向话筒中心)
+        ((13.7, 4.1), (13, 9), (17.9, 8.3)),  # 箭头头 (在中心端)
+    ),
+}
+
+
+# 列表中主叫/被叫的话筒图标: 预先合成的静态SVG (assets 目录, 内容由 phone_icon_svg() 生成),
+# 每行只传递资源路径, 不再内嵌整张图片
+PHONE_ICON_ASSETS = {True: "/images/phone_outgoing.svg", False: "/images/phone_incoming.svg"}
+
+
+@functools.lru_cache(maxsize=None)
+def phone_icon_svg(color, is_outgoing):
+    """合成话筒+箭头的SVG (PHONE_ICON_ASSETS 中的文件按 OUTGOING_COLOR / INCOMING_COLOR 生成)"""
+    # 话筒缩放到24网格, 箭头线宽2.5 (原Canvas按 size/24 缩放, 与此等价)
+    arrows = "".join(
+        f'<polyline points="{" ".join(f"{x},{y}" for x, y in points)}"/>'
+        for points in PHONE_ARROW_POLYLINES[bool(is_outgoing)]
+    )
+    return (
+        '<svg viewBox="0 0 24 24" xmlns="http://www.w3.org/2000/svg">'
+        f'<path transform="scale(0.0234375)" d="{PHONE_HANDSET_PATH}" fill="{color}"/>'
+        f'<g fill="none" stroke="{color}" stroke-width="2.5" stroke-linecap="round" stroke-linejoin="round">{arrows}</g>'
+        '</svg>\n'
+    )
+
+
+def create_phone_icon(size, is_outgoing=True):
+    """绘制自定义空心话筒图标 (带箭头区分主叫/被叫), 引用预合成的SVG资源"""
+    return ft.Image(
+        src=PHONE_ICON_ASSETS[bool(is_outgoing)],
         width=size,
         height=size,
-        color=color,
         fit=ft.ImageFit.CONTAIN
     )
-    
-    # 绘制箭头
-    scale = size / 24.0
-    stroke_width = 2.5 * scale # 加粗线条 (原2.0)
-    arrow_paint = ft.Paint(
-        style=ft.PaintingStyle.STROKE, 
-        stroke_width=stroke_width, 
-        color=color, 
-        stroke_cap=ft.StrokeCap.ROUND, 
-        stroke_join=ft.StrokeJoin.ROUND
-    )
-    
-    shapes = []
-    
-    if is_outgoing:
-        # 主叫 (绿色): 箭头从话筒顶部水平指向右边
-        # 话筒顶部 (听筒) 大概在 (17, 5) 附近 (基于24网格)
-        # 往左移动一点，更靠近话筒: x减小
-        
-        start_x, start_y = 15 * scale, 6 * scale # 顶部，左移
-        end_x, end_y = 24 * scale, 6 * scale     # 水平向右，长度保持
-        
-        shapes.append(cv.Path([
-            cv.Path.MoveTo(start_x, start_y), 
-            cv.Path.LineTo(end_x, end_y)
-        ], paint=arrow_paint))
-        
-        # 箭头头 (在右端)
-        shapes.append(cv.Path([
-            cv.Path.MoveTo(20 * scale, 3 * scale), # 上翼
-            cv.Path.LineTo(end_x, end_y),           # 尖端
-            cv.Path.LineTo(20 * scale, 9 * scale)  # 下翼
-        ], paint=arrow_paint))
-    else:
-        # 被叫 (蓝色): 箭头在左上/顶侧，向内指 (指向话筒)
-        # 同样整体往左/下移一点
-        
-        start_x, start_y = 20 * scale, 2 * scale # 起点 (右上)
-        end_x, end_y = 13 * scale, 9 * scale  # 终点 (指向话筒中心，更深入一点)
-        
-        shapes.append(cv.Path([
-            cv.Path.MoveTo(start_x, start_y), 
-            cv.Path.LineTo(end_x, end_y) 
-        ], paint=arrow_paint))
-        # 箭头头 (在中心端)
-        shapes.append(cv.Path([
-            cv.Path.MoveTo(13.7 * scale, 4.1 * scale), # 修正坐标以匹配箭头形状
-            cv.Path.LineTo(end_x, end_y),
-            cv.Path.LineTo(17.9 * scale, 8.3 * scale)  # 修正坐标以匹配箭头形状
-        ], paint=arrow_paint))
-        
-    arrow_canvas = cv.Canvas(shapes, width=size, height=size)
-    
-    return ft.Stack([
-        handset_image,
-        arrow_canvas
-    ], width=size, height=size)
 
 
-def create_sort_icons(size=20, color_up="#353535", color_down="#a3a3a3"):
-    """绘制排序图标: 两个三角形，底对底"""
+@functools.lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def sort_shape_specs(size, color_up, color_down):
+    """排序图标图形描述"""
     width = size * 0.6 # 整体宽度
     height = size      # 整体高度
-    
     triangle_width = width * 0.8 # 三角形底边宽度
     triangle_height = height * 0.28 # 单个三角形高度 (稍微调低一点)
     gap = height * 0.1 # 间距
@@ -405,68 +384,273 @@ def create_sort_icons(size=20, color_up="#353535", color_down="#a3a3a3"):
     center_x = width / 2
     center_y = height / 2
     
-    shapes = []
-    
-    # 上箭头 (尖朝上)
-    shapes.append(
-        cv.Path(
-            [
-                cv.Path.MoveTo(center_x, center_y - gap/2 - triangle_height),
-                cv.Path.LineTo(center_x - triangle_width/2, center_y - gap/2),
-                cv.Path.LineTo(center_x + triangle_width/2, center_y - gap/2),
-                cv.Path.Close()
-            ],
+    return (
+        # 上箭头 (尖朝上)
+        (cv.Path, dict(
+            elements=polyline_elements([
+                (center_x, center_y - gap/2 - triangle_height),
+                (center_x - triangle_width/2, center_y - gap/2),
+                (center_x + triangle_width/2, center_y - gap/2),
+            ], close=True),
             paint=ft.Paint(style=ft.PaintingStyle.FILL, color=color_up)
-        )
-    )
-    
-    # 下箭头 (尖朝下)
-    shapes.append(
-        cv.Path(
-            [
-                cv.Path.MoveTo(center_x, center_y + gap/2 + triangle_height),
-                cv.Path.LineTo(center_x - triangle_width/2, center_y + gap/2),
-                cv.Path.LineTo(center_x + triangle_width/2, center_y + gap/2),
-                cv.Path.Close()
-            ],
+        )),
+        # 下箭头 (尖朝下)
+        (cv.Path, dict(
+            elements=polyline_elements([
+                (center_x, center_y + gap/2 + triangle_height),
+                (center_x - triangle_width/2, center_y + gap/2),
+                (center_x + triangle_width/2, center_y + gap/2),
+            ], close=True),
             paint=ft.Paint(style=ft.PaintingStyle.FILL, color=color_down)
-        )
+        )),
     )
-    
-    return cv.Canvas(shapes, width=width, height=height)
 
 
-def create_dropdown_icon(size=12, color="#999999"):
-    """绘制下拉图标: 等边三角形，指向下"""
+def create_sort_icons(size=20, color_up="#353535", color_down="#a3a3a3"):
+    """绘制排序图标: 两个三角形，底对底"""
+    return build_canvas(sort_shape_specs(size, color_up, color_down), width=size * 0.6, height=size)
+
+
+@functools.lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def dropdown_shape_specs(size, color):
+    """下拉图标图形描述"""
     width = size
     # 等边三角形高度 = sqrt(3)/2 * 边长 ≈ 0.866 * 边长
     height = size * 0.866
     
     center_x = width / 2
-    center_y = width / 2 # 画布中心
     
     # 三角形中心调整，使其在画布垂直居中
     y_offset = (width - height) / 2
     
-    shapes = [
-        cv.Path(
-            [
-                cv.Path.MoveTo(center_x, y_offset + height),       # 下顶点 (尖)
-                cv.Path.LineTo(0, y_offset),                       # 左上
-                cv.Path.LineTo(width, y_offset),                   # 右上
-                cv.Path.Close()
-            ],
+    return (
+        (cv.Path, dict(
+            elements=polyline_elements([
+                (center_x, y_offset + height),       # 下顶点 (尖)
+                (0, y_offset),                       # 左上
+                (width, y_offset),                   # 右上
+            ], close=True),
             paint=ft.Paint(style=ft.PaintingStyle.FILL, color=color)
+        )),
+    )
+
+
+def create_dropdown_icon(size=12, color="#999999"):
+    """绘制下拉图标: 等边三角形，指向下"""
+    # 画布必须是正方形以容纳旋转等操作(虽然这里没旋转)
+    return build_canvas(dropdown_shape_specs(size, color), width=size, height=size)
+
+
+# 行内文字格式化结果的缓存上限 (时长/费用等取值有限, 刷新列表时大量重复)
+FORMAT_CACHE_SIZE = 4096
+
+# 星期名称, 下标与 datetime.weekday() 一致
+WEEKDAY_FULL_NAMES = ("星期一", "星期二", "星期三", "星期四", "星期五", "星期六", "星期日")
+# call_at 起点 1970-01-01 是星期四
+CALL_AT_EPOCH_WEEKDAY = 3
+
+
+@functools.lru_cache(maxsize=FORMAT_CACHE_SIZE)
+def format_duration(duration):
+    """格式化通话时长文本"""
+    if duration < 60:
+        return f"{duration}秒"
+    minutes, seconds = divmod(duration, 60)
+    return f"{minutes}分{seconds}秒" if seconds > 0 else f"{minutes}分钟"
+
+
+@functools.lru_cache(maxsize=FORMAT_CACHE_SIZE)
+def format_fee(fee):
+    """格式化费用文本"""
+    return f"¥{fee:.2f}"
+
+
+@functools.lru_cache(maxsize=FORMAT_CACHE_SIZE)
+def format_minutes(minutes):
+    """格式化计费分钟数文本"""
+    return f"{minutes}分钟"
+
+
+def format_total_duration(duration):
+    """格式化累计通话时长文本 (统计页使用, 超过一小时按小时显示)"""
+    if duration < 3600:
+        return format_duration(duration)
+    hours, seconds = divmod(duration, 3600)
+    return f"{hours}小时{seconds // 60}分"
+
+
+def format_weekday(log: dict) -> str:
+    """记录的星期: 优先使用保存的星期, 否则由 call_at 按天数直接推算 (不解析日期文本)"""
+    if log.get('weekday'):
+        return log['weekday']
+    call_at = log.get('call_at')
+    if call_at is None:
+        return ""
+    return WEEKDAY_FULL_NAMES[(call_at // 86400 + CALL_AT_EPOCH_WEEKDAY) % 7]
+
+
+# 月份选择器内部方块大小 (固定以保持正方形，外层自适应)
+MONTH_BOX_SIZE = 48 # 调大一点，减少间距
+MONTH_TOP_SECTION_HEIGHT = 26 # 再次微调高度，留出边框
+MONTH_BOTTOM_SECTION_HEIGHT = 15 # 再次微调高度
+
+
+# 距离列表底部多少像素时开始加载下一页
+LOAD_MORE_THRESHOLD = 600
+
+# 数据库操作超过该时长 (秒) 才显示加载进度条, 避免快速操作时进度条闪烁
+LOADING_INDICATOR_DELAY = 0.15
+
+# 号码筛选输入停止多久 (秒) 后才执行搜索
+SEARCH_DEBOUNCE_DELAY = 0.25
+
+# 界面更新合并窗口 (秒): 同一事件及随后一帧内的多次修改只发送一次 page.update()
+UPDATE_FRAME_DELAY = 0.016
+
+# 提示条显示时长 (毫秒), 带"撤销"按钮时显示更久
+SNACKBAR_DURATION = 4000
+UNDO_SNACKBAR_DURATION = 6000
+
+# 删除后空闲多久 (秒) 执行后台整理: 撤销时长过后刚删除的记录才能物理删除 (created_at 精确到秒, 多等几秒)
+COMPACTION_DELAY = UNDO_WINDOW + 5
+
+# 对话框/底部菜单关闭后等待多久 (秒) 从 page.overlay 移除, 留出关闭动画的时间
+OVERLAY_REMOVE_DELAY = 0.5
+
+
+# 行内可直接修改的文本字段及其格式化方式 (其余字段变化时整行重建)
+ROW_TEXT_FORMATTERS = {
+    'phone_number': str,
+    'location': str,
+    'connect_time': str,
+    'call_duration': format_duration,
+    'billing_minutes': format_minutes,
+    'call_fee': format_fee,
+}
+
+# 详情区的 (标签, 字段), 按显示顺序; 标签和值各合并为一个多行Text以减少每行的控件数
+ROW_DETAIL_FIELDS = (
+    ("对方号码归属地", 'location'),
+    ("接通时间:", 'connect_time'),
+    ("通话时长:", 'call_duration'),
+    ("计费分钟数:", 'billing_minutes'),
+    ("通话费用:", 'call_fee'),
+)
+ROW_DETAIL_LABELS = "\n".join(label for label, _ in ROW_DETAIL_FIELDS)
+# 详情文字样式 (行高对应原来每项一行、间距5的排版)
+ROW_DETAIL_STYLE = ft.TextStyle(size=13, color="#999999", weight=ft.FontWeight.W_500, height=1.6)
+
+# 日历徽章背景: 上70%浅红、1px分割线、下30%白色, 用硬边渐变代替三个容器
+DATE_BADGE_GRADIENT = ft.LinearGradient(
+    begin=ft.alignment.top_center,
+    end=ft.alignment.bottom_center,
+    colors=["#fff7f7", "#fff7f7", "#fbe0e9", "#fbe0e9", "#fefefe", "#fefefe"],
+    stops=[0.0, 0.58, 0.58, 0.61, 0.61, 1.0],
+)
+
+
+def format_row_details(log: dict) -> str:
+    """详情区各字段的值, 每行一个"""
+    return "\n".join(ROW_TEXT_FORMATTERS[field](log[field]) for _, field in ROW_DETAIL_FIELDS)
+
+# 按日选择日历: 格子边长/间距 (px) 和表头
+DAY_CELL_SIZE = 40
+DAY_CELL_SPACING = 4
+WEEKDAY_NAMES = ("一", "二", "三", "四", "五", "六", "日")
+# 热力图颜色: 通话次数从少到多在两色之间插值
+HEAT_COLOR_LOW = (0xff, 0xf7, 0xf7)
+HEAT_COLOR_HIGH = (0xeb, 0x4c, 0x46)
+
+# 统计页: 条形图的最大宽度 / 每日柱状图的最大高度和柱宽
+STATS_BAR_WIDTH = 140
+STATS_DAY_BAR_HEIGHT = 60
+STATS_DAY_BAR_WIDTH = 6
+STATS_BAR_COLOR = "#eb4c46"
+# 主叫/被叫的颜色与列表中的电话图标一致
+OUTGOING_COLOR = "#0bb415"
+INCOMING_COLOR = "#5fa8f2"
+# 通话时长区间的名称 (与 database.DURATION_BUCKET_EDGES 对应)
+DURATION_BUCKET_LABELS = ("未接通", "1分钟内", "1-3分钟", "3-10分钟", "10-30分钟", "30分钟以上")
+
+
+@functools.lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def heat_color(ratio: float) -> str:
+    """热力图颜色 (ratio 为 0~1)"""
+    ratio = min(max(ratio, 0.0), 1.0)
+    return "#" + "".join(
+        f"{round(low + (high - low) * ratio):02x}" for low, high in zip(HEAT_COLOR_LOW, HEAT_COLOR_HIGH)
+    )
+
+# 启动时默认选择的年份和月份
+INITIAL_YEAR = "2025"
+INITIAL_MONTH = "12月"
+
+# 启动屏最短显示时长 (秒), 预热很快时避免启动屏一闪而过; 设为0则预热完成立即进入
+SPLASH_MIN_DURATION = 0.3
+
+
+class StartupWarmUp:
+    """启动预热: 打开数据库并准备首屏数据、预先计算图标几何, 各阶段计时"""
+
+    def __init__(self):
+        self.db = None
+        self.db_worker = None
+        self.top_phone_number = None
+        self.total_fee = 0.0
+        self.first_page = []
+        # 阶段名 -> 耗时(秒)
+        self.timings = {}
+
+    def timed(self, name: str, func, *args, **kwargs):
+        """执行一个预热阶段并记录耗时"""
+        started = time.perf_counter()
+        with profiler.phase(name, "warm_up"):
+            result = func(*args, **kwargs)
+        self.timings[name] = time.perf_counter() - started
+        logger.info("启动预热 %s: %.1f ms", name, self.timings[name] * 1000)
+        return result
+
+    def load_data(self):
+        """打开数据库 (进程内各会话共用, 只在第一次打开时初始化示例数据) 并读取首屏需要的数据"""
+        # 检查是否有数据，如果没有则创建示例数据
+        self.db, self.db_worker = self.timed(
+            "open_db", shared_database, setup=lambda db: self.timed("init_data", db.init_sample_data)
         )
-    ]
-    
-    return cv.Canvas(shapes, width=width, height=width)  # 画布必须是正方形以容纳旋转等操作(虽然这里没旋转)
+        self.top_phone_number = self.db.get_config("top_phone_number", "175****8164")
+        self.total_fee = self.db.get_total_fee()
+        self.first_page = self.timed(
+            "first_page", self.db.get_logs_page,
+            limit=PAGE_SIZE + 1, year=int(INITIAL_YEAR), month=int(INITIAL_MONTH.rstrip('月'))
+        )
+
+    def prebuild_icons(self):
+        """预先计算界面用到的图标几何 (结果进入LRU缓存, 构建界面时直接命中)"""
+        def build():
+            arrow_shape_specs(22, "#000000", 2)
+            star_shape_specs(24, "#000000", 2)
+            fingerprint_shape_specs(350, 200)
+            calendar_shape_specs(25, "#e57d80", "#ffdee3")
+            sort_shape_specs(16, "#a3a3a3", "#353535")
+            dropdown_shape_specs(8, ft.Colors.GREY_400)
+            search_shape_specs(16, "#939393", 1.8)
+        self.timed("icons", build)
+
+    async def run(self):
+        """在线程池中并行执行数据库预热和图标预热"""
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        await asyncio.gather(
+            loop.run_in_executor(None, self.load_data),
+            loop.run_in_executor(None, self.prebuild_icons),
+        )
+        self.timings["total"] = time.perf_counter() - started
+        logger.info("启动预热完成: %.1f ms", self.timings["total"] * 1000)
 
 
 class CallLogApp:
     """通话记录应用主类"""
     
-    def __init__(self, page: ft.Page):
+    def __init__(self, page: ft.Page, warm_up: StartupWarmUp = None):
         self.page = page
         self.page.theme = ft.Theme(
             font_family="Microsoft YaHei",
@@ -477,30 +661,74 @@ class CallLogApp:
                 interactive=False
             )
         )  # 设置全局字体和隐藏滚动条
-        self.db = CallLogDatabase()
+        # 未经过启动屏预热时 (直接构造) 同步加载数据
+        if warm_up is None:
+            warm_up = StartupWarmUp()
+            warm_up.load_data()
+        self.db = warm_up.db
+        # 界面事件中的数据库操作都交给后台线程执行 (与同一进程中的其他会话共用)
+        self.db_worker = warm_up.db_worker
+        self.pending_db_calls = 0
+
+        # 合并界面更新: 是否已有待发送的更新 / 该更新排在哪个事件循环上 (事件处理可能在线程中执行)
+        self.update_pending = False
+        self.update_loop = None
+        self.update_lock = threading.Lock()
+        # 复用的提示条 (首次提示时创建)
+        self.snackbar = None
+        # 等待执行的后台整理 / 正在执行的整理任务
+        self.compaction_handle = None
+        self.compaction_task = None
+        # 数据库提交的记录变更 (包括其他会话的修改): 等待应用的合并变更 / 正在应用的任务
+        self.pending_changes = None
+        self.changes_task = None
         
         # 从数据库加载顶部电话号码，默认为 175****8164
-        self.top_phone_number = self.db.get_config("top_phone_number", "175****8164")
+        self.top_phone_number = warm_up.top_phone_number
         
         # 点击计数器(用于连续点击检测)
         self.click_count = 0
         self.last_click_time = 0
         
         # 当前选择的月份
-        self.current_month = "12月"
-        self.current_year = "2025"
+        self.current_month = INITIAL_MONTH
+        self.current_year = INITIAL_YEAR
         
         # 选中的记录ID列表
         self.selected_logs = []
-        
+
+        # 记录ID -> 列表行控件 (用于增量刷新)
+        self.call_rows = {}
+
+        # 分页加载状态: 已加载的最后一条记录 (键集分页游标) / 是否还有下一页
+        self.last_loaded_log = None
+        self.has_more = True
+        self.loading_page = False
+        # 列表每次重置时加一，用于丢弃重置前发起、重置后才返回的查询结果
+        self.list_generation = 0
+
+        # 号码筛选: 当前生效的搜索词 / 每次输入加一，用于防抖
+        self.search_query = ""
+        self.search_generation = 0
+
+        # 排序方式 / 呼叫类型筛选 (1 主叫, 0 被叫) / 费用筛选 ('paid', 'free')
+        self.list_order = DEFAULT_ORDER
+        self.direction_filter = None
+        self.fee_filter = None
+        # 按日选择: 当前只看的日期 ("MM.DD", None 为全月)
+        self.day_filter = None
+
         # 初始化页面配置
         self.setup_page()
         
-        # 初始化数据
-        self.init_data()
-        
         # 构建UI
-        self.build_ui()
+        self.build_ui(warm_up)
+
+        # 订阅记录变更, 其他会话增删改记录后只更新对应的行; 会话关闭时取消订阅
+        self.db.subscribe(self.on_log_changes)
+        self.page.on_close = self.on_page_close
+        # 上次运行中删除、还没来得及整理的记录: 空闲后整理
+        self.schedule_compaction()
     
     def setup_page(self):
         """配置页面属性"""
@@ -522,14 +750,68 @@ class CallLogApp:
         self.page.window.width = 400
         self.page.window.height = 800
     
-    def init_data(self):
-        """初始化数据"""
-        # 检查是否有数据，如果没有则创建示例数据
-        logs = self.db.get_all_logs()
-        if not logs:
-            self.db.init_sample_data()
-    
-    def on_phone_number_click(self, e):
+    def event_loop(self):
+        """界面所在的事件循环 (没有可用的事件循环时返回 None)"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = getattr(self.page, 'loop', None)  # 在线程中执行的事件处理
+        return None if loop is None or loop.is_closed() else loop
+
+    def request_update(self):
+        """请求刷新界面: 一帧之内的多次请求合并为一次 page.update()"""
+        loop = self.event_loop()
+        if loop is None:
+            self.flush_update()
+            return
+        with self.update_lock:
+            if self.update_pending and not self.update_loop.is_closed():
+                return
+            self.update_pending = True
+            self.update_loop = loop
+        loop.call_soon_threadsafe(loop.call_later, UPDATE_FRAME_DELAY, self.flush_pending_update)
+
+    def flush_pending_update(self):
+        """发送合并后的界面更新 (期间已立即发送过则跳过)"""
+        with self.update_lock:
+            if not self.update_pending:
+                return
+            self.update_pending = False
+        self.page.update()
+
+    def flush_update(self):
+        """立即发送界面更新 (需要在更新后紧接着调用控件方法时使用, 如 scroll_to)"""
+        with self.update_lock:
+            self.update_pending = False
+        self.page.update()
+
+    async def db_call(self, func, *args, **kwargs):
+        """在数据库线程中执行操作, 耗时较长时显示加载进度条"""
+        return await self.track_db_call(self.db_worker.call(func, *args, **kwargs))
+
+    async def db_write(self, func, *args, **kwargs):
+        """在数据库线程中执行写操作, 连续的多次写入合并为一个事务提交"""
+        return await self.track_db_call(self.db_worker.write(func, *args, **kwargs))
+
+    async def track_db_call(self, operation):
+        """等待数据库操作完成, 超过 LOADING_INDICATOR_DELAY 仍未完成时显示加载进度条"""
+        loop = asyncio.get_running_loop()
+        self.pending_db_calls += 1
+        show_handle = loop.call_later(LOADING_INDICATOR_DELAY, self.set_loading, True)
+        try:
+            return await operation
+        finally:
+            show_handle.cancel()
+            self.pending_db_calls -= 1
+            if self.pending_db_calls == 0 and self.loading_bar.visible:
+                self.set_loading(False)
+
+    def set_loading(self, visible: bool):
+        """显示/隐藏列表上方的加载进度条"""
+        self.loading_bar.visible = visible
+        self.request_update()
+
+    async def on_phone_number_click(self, e):
         """电话号码点击事件 - 连续点击3次触发添加功能"""
         current_time = time.time()
         
@@ -542,8 +824,8 @@ class CallLogApp:
         
         if self.click_count == 3:
             # 触发添加通话记录对话框
-            self.show_log_dialog() # 使用通用的日志对话框
             self.click_count = 0
+            await self.show_log_dialog() # 使用通用的日志对话框
 
     def on_top_number_long_press(self, e):
         """顶部号码长按事件 - 编辑号码"""
@@ -558,12 +840,11 @@ class CallLogApp:
         )
 
         def close_dialog(e):
-            dialog.open = False
-            self.page.update()
+            self.close_overlay(dialog)
 
-        def save_number(e):
+        async def save_number(e):
             self.top_phone_number = phone_input.value
-            self.db.set_config("top_phone_number", self.top_phone_number)
+            await self.db_write(self.db.set_config, "top_phone_number", self.top_phone_number)
             # 更新UI显示
             self.top_phone_text.value = self.top_phone_number
             self.show_snackbar("号码修改成功", ft.Colors.GREEN_400)
@@ -578,9 +859,7 @@ class CallLogApp:
             ],
             actions_alignment=ft.MainAxisAlignment.END
         )
-        self.page.overlay.append(dialog)
-        dialog.open = True
-        self.page.update()
+        self.show_overlay(dialog)
     
     def on_call_log_long_press(self, log_id: int):
         """通话记录长按事件"""
@@ -588,15 +867,14 @@ class CallLogApp:
             self.show_edit_menu(log_id)
         return handler
     
-    def show_log_dialog(self, log_id: int = None):
+    async def show_log_dialog(self, log_id: int = None):
         """显示添加/编辑通话记录对话框"""
         is_edit = log_id is not None
         title = "编辑通话记录" if is_edit else "添加通话记录"
         
         current_log = None
         if is_edit:
-            logs = self.db.get_all_logs()
-            current_log = next((log for log in logs if log['id'] == log_id), None)
+            current_log = await self.get_cached_log(log_id)
             if not current_log:
                 return
 
@@ -619,16 +897,20 @@ class CallLogApp:
         fee_input = ft.TextField(label="通话费用", value=f"{current_log['call_fee']:.2f}" if is_edit else "0.00", expand=True, keyboard_type=ft.KeyboardType.NUMBER)
         
         def close_dialog(e):
-            dialog.open = False
-            self.page.update()
+            self.close_overlay(dialog)
         
-        def save_log(e):
+        async def save_log(e):
             try:
                 duration = int(duration_input.value)
                 billing = int(billing_input.value)
                 fee = float(fee_input.value)
+                # 编辑时保留原记录年份，添加时使用当前选择的年份
+                year = int(current_log.get('year') or self.current_year) if is_edit else int(self.current_year)
+                # 日期统一为两位数的 MM.DD 格式，保证按月查询正确
+                call_date = datetime.strptime(f"{year}.{date_input.value}", "%Y.%m.%d").strftime("%m.%d")
                 
-                call_data = {
+                # 补齐派生的 call_at (按当前排序插入新行时需要)
+                call_data = prepare_log({
                     'phone_number': phone_input.value,
                     'call_type': '高清语音',
                     'location': location_input.value,
@@ -636,25 +918,41 @@ class CallLogApp:
                     'call_duration': duration,
                     'billing_minutes': billing,
                     'call_fee': fee,
-                    'call_date': date_input.value,
+                    'call_date': call_date,
                     'call_time': time_input.value, # 暂时使用接通时间作为call_time
                     'is_hd_voice': 1,
                     'is_outgoing': 1 if is_outgoing_switch.value else 0,
-                    'weekday': weekday_input.value
-                }
-                
-                if is_edit:
-                    self.db.update_call_log(log_id, call_data)
-                    self.show_snackbar("修改成功", ft.Colors.GREEN_400)
-                else:
-                    self.db.add_call_log(call_data)
-                    self.show_snackbar("添加成功", ft.Colors.GREEN_400)
-                
-                close_dialog(e)
-                self.refresh_call_list()
-                
+                    'weekday': weekday_input.value,
+                    'year': year
+                })
+                if call_data['call_at'] is None:
+                    raise ValueError(f"无效的接通时间: {time_input.value}")
             except ValueError:
                 self.show_snackbar("请输入有效的数值", ft.Colors.RED_400)
+                return
+
+            # 数据库写入在后台线程完成，期间界面不被阻塞
+            if is_edit:
+                await self.db_write(self.db.update_call_log, log_id, call_data)
+                self.show_snackbar("修改成功", ft.Colors.GREEN_400)
+                close_dialog(e)
+                if self.is_in_current_list(call_data):
+                    # 只修改这一行中变化的字段 (排序值变化时移动到新位置)
+                    self.update_call_row({**call_data, 'id': log_id})
+                else:
+                    # 日期改到了其他月份或不再符合筛选条件，从当前列表移除
+                    self.remove_call_row(log_id)
+                self.update_list_footer()
+            else:
+                new_id = await self.db_write(self.db.add_call_log, call_data)
+                self.show_snackbar("添加成功", ft.Colors.GREEN_400)
+                close_dialog(e)
+                # 属于当前列表时按当前排序插入到对应位置
+                if self.is_in_current_list(call_data):
+                    self.place_call_row({**call_data, 'id': new_id})
+                    self.update_list_footer()
+            await self.update_fee_text()
+            self.request_update()
         
         dialog = ft.AlertDialog(
             title=ft.Text(title),
@@ -677,25 +975,28 @@ class CallLogApp:
             actions_alignment=ft.MainAxisAlignment.END
         )
         
-        self.page.overlay.append(dialog)
-        dialog.open = True
-        self.page.update()
+        self.show_overlay(dialog)
     
     def show_edit_menu(self, log_id: int):
         """显示编辑/删除菜单"""
         def close_menu(e):
-            bottom_sheet.open = False
-            self.page.update()
+            self.close_overlay(bottom_sheet)
         
-        def edit_log(e):
+        async def edit_log(e):
             close_menu(e)
-            self.show_log_dialog(log_id) # 使用通用对话框
+            await self.show_log_dialog(log_id) # 使用通用对话框
         
-        def delete_log(e):
-            self.db.delete_call_log(log_id)
-            self.show_snackbar("删除成功", ft.Colors.GREEN_400)
+        async def delete_log(e):
+            log = await self.get_cached_log(log_id)
+            batch = await self.db_write(self.db.delete_call_log, log_id)
+            self.show_snackbar("删除成功", ft.Colors.GREEN_400, on_undo=self.undo_handler(batch, log))
             close_menu(e)
-            self.refresh_call_list()
+            # 只移除被删除的一行
+            self.remove_call_row(log_id)
+            self.update_list_footer()
+            await self.update_fee_text()
+            self.request_update()
+            self.schedule_compaction()
         
         bottom_sheet = ft.BottomSheet(
             content=ft.Container(
@@ -723,81 +1024,338 @@ class CallLogApp:
             )
         )
         
-        self.page.overlay.append(bottom_sheet)
-        bottom_sheet.open = True
-        self.page.update()
+        self.show_overlay(bottom_sheet)
     
-    def show_snackbar(self, message: str, bgcolor: str):
-        """显示提示信息"""
-        snack = ft.SnackBar(
-            content=ft.Text(message, color="#fbfffd"),
-            bgcolor=bgcolor
-        )
-        self.page.overlay.append(snack)
-        snack.open = True
-        self.page.update()
+    def show_snackbar(self, message: str, bgcolor: str, on_undo=None):
+        """显示提示信息 (复用同一个 SnackBar, 只替换文字和颜色); 指定 on_undo 时带"撤销"按钮"""
+        if self.snackbar is None:
+            self.snackbar = ft.SnackBar(content=ft.Text(color="#fbfffd"), action_color="#fbfffd")
+            self.page.overlay.append(self.snackbar)
+        self.snackbar.content.value = message
+        self.snackbar.bgcolor = bgcolor
+        self.snackbar.action = "撤销" if on_undo else None
+        self.snackbar.on_action = on_undo
+        self.snackbar.duration = UNDO_SNACKBAR_DURATION if on_undo else SNACKBAR_DURATION
+        self.snackbar.open = True
+        self.request_update()
+
+    def undo_handler(self, batch, log: dict = None):
+        """生成"撤销"按钮的处理函数: 恢复删除批次 batch; log 为单条删除时被删除的记录"""
+        if batch is None:
+            return None
+
+        async def on_undo(e):
+            restored = await self.db_write(self.db.undo, batch)
+            if not restored:
+                self.show_snackbar("已无法撤销", ft.Colors.RED_400)
+                return
+            if log is not None:
+                # 单条删除: 属于当前列表时放回原来的位置
+                if self.is_in_current_list(log):
+                    self.place_call_row(log)
+                    self.update_list_footer()
+                await self.update_fee_text()
+            else:
+                await self.refresh_call_list()
+            self.show_snackbar(f"已恢复 {restored} 条记录", ft.Colors.GREEN_400)
+        return on_undo
+
+    def schedule_compaction(self):
+        """删除后延迟执行后台整理 (物理删除不可撤销的记录并压缩数据库), 连续删除只整理一次"""
+        loop = self.event_loop()
+        if loop is None:
+            return
+        if self.compaction_handle is not None:
+            self.compaction_handle.cancel()
+        self.compaction_handle = loop.call_later(COMPACTION_DELAY, self.start_compaction)
+
+    def start_compaction(self):
+        """在事件循环中启动后台整理任务"""
+        self.compaction_handle = None
+        self.compaction_task = asyncio.ensure_future(self.compact_database())
+
+    async def compact_database(self):
+        """后台整理数据库 (不显示加载进度条)"""
+        purged = await self.db_worker.write_alone(self.db.compact)
+        if purged:
+            logger.info("后台整理: 物理删除 %d 条记录", purged)
+
+    def on_log_changes(self, changes: dict):
+        """数据库提交了记录变更 (在写入的线程中调用): 转到界面的事件循环中应用"""
+        loop = getattr(self.page, 'loop', None)
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self.queue_log_changes, changes)
+
+    def queue_log_changes(self, changes: dict):
+        """在事件循环中合并变更, 没有正在应用的任务时启动一个 (连续的变更合并后一起应用)"""
+        self.pending_changes = merge_changes(self.pending_changes or empty_changes(), changes)
+        if self.changes_task is None or self.changes_task.done():
+            self.changes_task = asyncio.ensure_future(self.apply_log_changes())
+
+    async def apply_log_changes(self):
+        """依次应用排队的变更: 需要整体刷新时重新获取已加载范围, 否则只修改变更的行"""
+        while self.pending_changes is not None:
+            changes, self.pending_changes = self.pending_changes, None
+            if changes['reload']:
+                await self.refresh_call_list()
+                continue
+            changed_ids = changes['inserted'] | changes['updated']
+            for log_id in changes['deleted'] - changed_ids:
+                self.remove_call_row(log_id)
+            logs = await self.db_call(self.db.get_logs_by_ids, changed_ids) if changed_ids else []
+            for log in logs:
+                if self.is_in_current_list(log):
+                    self.update_call_row(log)
+                else:
+                    self.remove_call_row(log['id'])
+            # 查询前又被删除的记录
+            for log_id in changed_ids - {log['id'] for log in logs}:
+                self.remove_call_row(log_id)
+            self.update_list_footer()
+            await self.update_fee_text()
+            self.request_update()
+
+    def on_page_close(self, e):
+        """会话关闭: 取消订阅记录变更"""
+        self.db.unsubscribe(self.on_log_changes)
+
+    def show_overlay(self, control):
+        """打开对话框/底部菜单: 加入 page.overlay, 关闭后自动移除"""
+        async def on_dismiss(e):
+            # 点击外部或返回键关闭时客户端已经关闭了该控件
+            control.open = False
+            self.remove_overlay(control)
+
+        control.on_dismiss = on_dismiss
+        self.page.overlay.append(control)
+        control.open = True
+        self.request_update()
+
+    def close_overlay(self, control):
+        """关闭对话框/底部菜单, 关闭动画结束后从 page.overlay 移除"""
+        control.open = False
+        self.request_update()
+        loop = self.event_loop()
+        if loop is None:
+            self.remove_overlay(control)
+        else:
+            loop.call_soon_threadsafe(loop.call_later, OVERLAY_REMOVE_DELAY, self.remove_overlay, control)
+
+    def remove_overlay(self, control):
+        """从 page.overlay 移除已关闭的控件 (在事件循环中调用, 重复调用无影响)"""
+        if control.open or control not in self.page.overlay:
+            return
+        self.page.overlay.remove(control)
+        self.request_update()
     
-    def refresh_call_list(self):
+    async def refresh_call_list(self):
         """刷新通话记录列表"""
-        # 重新获取数据
-        logs = self.db.get_all_logs()
-        total_fee = self.db.get_total_fee()
-        
+        # 重新获取已加载范围内的数据 (至少一页)
+        limit = max(len(self.call_rows), PAGE_SIZE)
+        generation = self.list_generation
+        logs = await self.db_call(self.db.get_logs_page, limit=limit + 1, **self.list_filter())
+        if generation != self.list_generation:
+            return
+        self.has_more = len(logs) > limit
+        logs = logs[:limit]
+        self.last_loaded_log = logs[-1] if logs else None
+
         # 更新费用显示
+        await self.update_fee_text()
+
+        # 按ID对比差异，只增删改发生变化的行
+        self.reconcile_call_list(logs)
+
+        self.request_update()
+
+    async def load_next_page(self):
+        """加载下一页通话记录并追加到列表末尾"""
+        # 多取一条用于判断是否还有下一页
+        generation = self.list_generation
+        logs = await self.db_call(self.db.get_logs_page, **self.next_page_query())
+        if generation == self.list_generation:
+            self.append_page(logs)
+
+    def next_page_query(self) -> dict:
+        """下一页的查询参数"""
+        return {'after': self.last_loaded_log, 'limit': PAGE_SIZE + 1, **self.list_filter()}
+
+    def append_page(self, logs: list):
+        """将查询到的一页记录追加到列表末尾 (logs 比一页多取一条用于判断是否还有下一页)"""
+        self.has_more = len(logs) > PAGE_SIZE
+        logs = logs[:PAGE_SIZE]
+        for log in logs:
+            self.insert_call_row(log, len(self.call_rows))
+        if logs:
+            self.last_loaded_log = logs[-1]
+        self.update_list_footer()
+
+    async def on_list_scroll(self, e: ft.OnScrollEvent):
+        """列表滚动事件 - 接近底部时加载下一页"""
+        if self.loading_page or not self.has_more:
+            return
+        if e.pixels >= e.max_scroll_extent - LOAD_MORE_THRESHOLD:
+            self.loading_page = True
+            try:
+                await self.load_next_page()
+                self.request_update()
+            finally:
+                self.loading_page = False
+
+    async def get_cached_log(self, log_id: int):
+        """按ID获取记录: 优先使用列表中已加载的行数据，未加载时按主键查询"""
+        row = self.call_rows.get(log_id)
+        if row is not None:
+            return row.data['log']
+        return await self.db_call(self.db.get_log, log_id)
+
+    async def update_fee_text(self):
+        """更新顶部费用总计"""
+        total_fee = await self.db_call(self.db.get_total_fee)
         self.fee_text.value = f"{total_fee:.2f}元"
-        
-        # 更新通话记录列表
-        self.call_list.controls.clear()
+
+    def reconcile_call_list(self, logs: list):
+        """将列表控件与最新数据按ID对齐 (已有的行控件复用并只修改变化的字段)"""
+        latest_ids = {log['id'] for log in logs}
+        for log_id in [log_id for log_id in self.call_rows if log_id not in latest_ids]:
+            del self.call_rows[log_id]
+
+        rows = []
         for log in logs:
-            self.call_list.controls.append(self.create_call_item(log))
-        
-        # 添加底部提示："没有更多了"
-        if logs:  # 只有当有记录时才显示
-            self.call_list.controls.append(
-                ft.Column([
-                    # 分割线
-                    ft.Container(
-                        height=0.5,
-                        bgcolor="#eeeeee",
-                        margin=ft.margin.symmetric(horizontal=15)
-                    ),
-                    # "没有更多了"文字
-                    ft.Container(
-                        content=ft.Text(
-                            "没有更多了",
-                            size=13,
-                            color="#999999",
-                            weight=ft.FontWeight.W_500
-                        ),
-                        alignment=ft.alignment.center,
-                        padding=ft.padding.symmetric(vertical=15)
-                    )
-                ], spacing=0)
+            if log['id'] in self.call_rows:
+                self.patch_call_row(log)
+            else:
+                self.call_rows[log['id']] = self.create_call_item(log)
+            rows.append(self.call_rows[log['id']])
+        # 一次性替换为新顺序 (逐行移动在大列表上是平方复杂度)
+        self.call_list.controls[:] = rows
+
+        self.update_list_footer()
+
+    def insert_call_row(self, log: dict, index: int = 0):
+        """在指定位置插入一行记录"""
+        row = self.create_call_item(log)
+        self.call_rows[log['id']] = row
+        self.call_list.controls.insert(index, row)
+        return row
+
+    def patch_call_row(self, log: dict):
+        """只修改一行中发生变化的文本; 影响图标/日历徽章的字段变化时重建该行"""
+        row = self.call_rows.get(log['id'])
+        if row is None:
+            return
+        old_log = row.data['log']
+        changed = [key for key, value in log.items() if old_log.get(key) != value]
+        if not changed:
+            return
+
+        if any(key not in ROW_TEXT_FORMATTERS for key in changed):
+            index = self.call_list.controls.index(row)
+            self.call_list.controls[index] = new_row = self.create_call_item({**old_log, **log})
+            self.call_rows[log['id']] = new_row
+            return
+
+        old_log.update(log)
+        if 'phone_number' in changed:
+            row.data['phone'].value = old_log['phone_number']
+        if any(key != 'phone_number' for key in changed):
+            row.data['details'].value = format_row_details(old_log)
+
+    def place_call_row(self, log: dict):
+        """按当前排序把记录插入到已加载范围内的对应位置; 排在已加载范围之后时留给分页加载"""
+        if log['id'] in self.call_rows:
+            # 变更通知可能先于本会话的保存/撤销处理放入了这一行
+            self.update_call_row(log)
+            return
+        rows = [control for control in self.call_list.controls if control is not self.list_footer]
+        key = log_sort_key(log, self.list_order)
+        descending = SORT_ORDERS[self.list_order][1]
+        # 第一条应排在该记录之后的行 (条件随下标单调, 可二分)
+        index = bisect.bisect_left(
+            range(len(rows)), True,
+            key=lambda i: (log_sort_key(rows[i].data['log'], self.list_order) < key) == descending
+        )
+        if index == len(rows) and self.has_more:
+            return
+        self.insert_call_row(log, index)
+
+    def update_call_row(self, log: dict):
+        """修改后的记录: 排序值不变时只修改变化的字段, 否则移动到新的位置"""
+        row = self.call_rows.get(log['id'])
+        if row is None:
+            self.place_call_row(log)
+            return
+        new_log = {**row.data['log'], **log}
+        if log_sort_key(new_log, self.list_order) == log_sort_key(row.data['log'], self.list_order):
+            self.patch_call_row(new_log)
+            return
+        self.remove_call_row(log['id'])
+        self.place_call_row(new_log)
+
+    def remove_call_row(self, log_id: int):
+        """移除一行记录"""
+        row = self.call_rows.pop(log_id, None)
+        if row is not None:
+            self.call_list.controls.remove(row)
+
+    def update_list_footer(self):
+        """底部提示"没有更多了": 只有当有记录且已加载到最后一页时才显示"""
+        has_footer = bool(self.call_list.controls) and self.call_list.controls[-1] is self.list_footer
+        show_footer = bool(self.call_rows) and not self.has_more
+        if show_footer and not has_footer:
+            self.call_list.controls.append(self.list_footer)
+        elif not show_footer and has_footer:
+            self.call_list.controls.pop()
+
+    def create_list_footer(self):
+        """创建底部"没有更多了"提示"""
+        return ft.Column([
+            # 分割线
+            ft.Container(
+                height=0.5,
+                bgcolor="#eeeeee",
+                margin=ft.margin.symmetric(horizontal=15)
+            ),
+            # "没有更多了"文字
+            ft.Container(
+                content=ft.Text(
+                    "没有更多了",
+                    size=13,
+                    color="#999999",
+                    weight=ft.FontWeight.W_500
+                ),
+                alignment=ft.alignment.center,
+                padding=ft.padding.symmetric(vertical=15)
             )
-        
-        self.page.update()
+        ], spacing=0)
 
     def show_more_menu(self):
         """显示更多菜单"""
+        def import_logs_click(e):
+            self.close_overlay(bs)
+            self.import_file_picker.pick_files(
+                dialog_title="选择详单文件",
+                allowed_extensions=["csv", "xlsx"]
+            )
+
         def clear_logs_click(e):
-            bs.open = False
-            self.page.update()
+            self.close_overlay(bs)
             
             # 显示二次确认对话框
-            def confirm_clear(e):
-                self.db.clear_all_logs()
-                confirm_dialog.open = False
-                self.page.update()
-                self.refresh_call_list()
-                self.show_snackbar("通话记录已清空", ft.Colors.GREEN_400)
+            async def confirm_clear(e):
+                self.close_overlay(confirm_dialog)
+                batch = await self.db_write(self.db.clear_all_logs)
+                await self.refresh_call_list()
+                self.show_snackbar("通话记录已清空", ft.Colors.GREEN_400, on_undo=self.undo_handler(batch))
+                self.schedule_compaction()
 
             def cancel_clear(e):
-                confirm_dialog.open = False
-                self.page.update()
+                self.close_overlay(confirm_dialog)
 
             confirm_dialog = ft.AlertDialog(
                 title=ft.Text("清空记录"),
-                content=ft.Text("确定要清空所有通话记录吗？此操作无法撤销。"),
+                content=ft.Text("确定要清空所有通话记录吗？清空后可在提示中撤销。"),
                 actions=[
                     ft.TextButton("取消", on_click=cancel_clear),
                     ft.TextButton("清空", on_click=confirm_clear, style=ft.ButtonStyle(color=ft.Colors.RED))
@@ -805,14 +1363,17 @@ class CallLogApp:
                 actions_alignment=ft.MainAxisAlignment.END
             )
             
-            self.page.overlay.append(confirm_dialog)
-            confirm_dialog.open = True
-            self.page.update()
+            self.show_overlay(confirm_dialog)
 
         bs = ft.BottomSheet(
             ft.Container(
                 ft.Column(
                     [
+                        ft.ListTile(
+                            leading=ft.Icon(ft.Icons.UPLOAD_FILE),
+                            title=ft.Text("导入详单 (CSV/XLSX)"),
+                            on_click=import_logs_click
+                        ),
                         ft.ListTile(
                             leading=ft.Icon(ft.Icons.DELETE_SWEEP, color=ft.Colors.RED_400),
                             title=ft.Text("清空所有记录", color=ft.Colors.RED_400),
@@ -821,7 +1382,7 @@ class CallLogApp:
                         ft.ListTile(
                             leading=ft.Icon(ft.Icons.CANCEL),
                             title=ft.Text("取消"),
-                            on_click=lambda e: setattr(bs, 'open', False) or self.page.update()
+                            on_click=lambda e: self.close_overlay(bs)
                         ),
                     ],
                     tight=True,
@@ -829,165 +1390,622 @@ class CallLogApp:
                 padding=10,
             ),
         )
-        self.page.overlay.append(bs)
-        bs.open = True
-        self.page.update()
+        self.show_overlay(bs)
     
-    def get_weekday(self, date_str):
-        """根据日期字符串(MM.DD)返回星期几"""
+    async def on_import_file_picked(self, e: ft.FilePickerResultEvent):
+        """选择详单文件后开始导入"""
+        if not e.files:
+            return
+        path = e.files[0].path
+        if not path:
+            self.show_snackbar("当前运行模式不支持导入本地文件", ft.Colors.RED_400)
+            return
+        await self.import_bill_file(path)
+
+    async def import_bill_file(self, path: str):
+        """在数据库线程中导入详单，并用进度对话框显示已导入条数"""
+        progress_dialog, progress_text = self.show_progress_dialog("导入详单", "正在导入...")
+        # 已提交的条数 (每个批次提交后回调)
+        imported = 0
+
+        def on_progress(count):
+            nonlocal imported
+            imported = count
+            progress_text.value = f"已导入 {count} 条"
+            self.request_update()
+
+        error = None
         try:
-            dt = datetime.strptime(f"{self.current_year}.{date_str}", "%Y.%m.%d")
-            weekdays = ["星期一", "星期二", "星期三", "星期四", "星期五", "星期六", "星期日"]
-            return weekdays[dt.weekday()]
-        except:
-            return "星期一"
+            result = await self.track_db_call(self.db_worker.write_alone(
+                import_bill, self.db, path, default_year=int(self.current_year), progress=on_progress
+            ))
+        except Exception as exc:
+            # 除了文件/格式错误, 损坏的 xlsx (BadZipFile)、过长的 CSV 字段 (csv.Error)、数据库错误等也在这里提示
+            logger.warning("导入详单失败: %s", path, exc_info=True)
+            error = exc
+        finally:
+            # 无论成功与否都关闭进度对话框, 否则模态对话框会一直挡住界面
+            self.close_overlay(progress_dialog)
+        if error is not None and not imported:
+            self.show_snackbar(f"导入失败: {error}", ft.Colors.RED_400)
+            return
+        await self.reset_call_list()
+        await self.update_fee_text()
+        if error is not None:
+            # 出错之前提交的批次已经写入
+            self.show_snackbar(f"导入中断: {error}，已导入 {imported} 条", ft.Colors.RED_400)
+            return
+        message = f"导入成功 {result.imported} 条"
+        if result.skipped:
+            line_no, reason = result.errors[0]
+            message += f"，跳过 {result.skipped} 条 (第{line_no}行: {reason})"
+        self.show_snackbar(message, ft.Colors.GREEN_400)
 
-    def create_call_item(self, log: dict):
-        """创建通话记录项 - 图2样式"""
-        # 格式化通话时长
-        duration = log['call_duration']
-        if duration < 60:
-            duration_text = f"{duration}秒"
-        else:
-            minutes = duration // 60
-            seconds = duration % 60
-            duration_text = f"{minutes}分{seconds}秒" if seconds > 0 else f"{minutes}分钟"
-        
-        # 左侧日历小组件
-        date_badge = ft.Container(
-            content=ft.Stack([
-                # 主体背景 (带边框)
-                ft.Container(
-                    content=ft.Column([
-                        # 上半部分: 日期
-                        ft.Container(
-                            content=ft.Text(log['call_date'], size=13, color="#e53935", weight=ft.FontWeight.W_500),
-                            alignment=ft.alignment.center,
-                            expand=6, # 占比 70%
-                            bgcolor="#fff7f7",
-                            border_radius=ft.border_radius.only(top_left=4, top_right=4),
-                            padding=ft.padding.only(top=3) # 往下移动
+    def show_progress_dialog(self, title: str, message: str):
+        """显示不可关闭的进度对话框，返回 (对话框, 进度文字)"""
+        progress_text = ft.Text(message, size=13, color="#666666")
+        progress_dialog = ft.AlertDialog(
+            modal=True,
+            title=ft.Text(title),
+            content=ft.Column([
+                ft.ProgressBar(width=260, color="#eb4c46", bgcolor="#fbe0e9"),
+                progress_text
+            ], tight=True, spacing=15)
+        )
+        self.show_overlay(progress_dialog)
+        return progress_dialog, progress_text
+
+    def show_export_menu(self):
+        """显示下载详单菜单 - 选择导出格式"""
+        def choose(fmt):
+            def handler(e):
+                self.close_overlay(bs)
+                self.pending_export_format = fmt
+                month_filter = self.month_filter()
+                self.export_file_picker.save_file(
+                    dialog_title="保存详单",
+                    file_name=f"通话详单_{month_filter['year']}{month_filter['month']:02d}.{EXPORT_FORMATS[fmt]}",
+                    allowed_extensions=[EXPORT_FORMATS[fmt]]
+                )
+            return handler
+
+        bs = ft.BottomSheet(
+            ft.Container(
+                ft.Column(
+                    [
+                        ft.ListTile(title=ft.Text(f"下载{self.current_month}详单 (CSV)"), on_click=choose('csv')),
+                        ft.ListTile(title=ft.Text(f"下载{self.current_month}详单 (JSON Lines)"), on_click=choose('jsonl')),
+                        ft.ListTile(title=ft.Text(f"下载{self.current_month}详单 (PDF)"), on_click=choose('pdf')),
+                        ft.ListTile(
+                            leading=ft.Icon(ft.Icons.CANCEL),
+                            title=ft.Text("取消"),
+                            on_click=lambda e: self.close_overlay(bs)
                         ),
-                        # 分割线
-                        ft.Container(height=1, bgcolor="#fbe0e9"),
-                        # 下半部分: 星期
-                        ft.Container(
-                            content=ft.Text(log.get('weekday') if log.get('weekday') else self.get_weekday(log['call_date']), size=10, color="#888888"),
-                            alignment=ft.alignment.center,
-                            expand=4, # 占比 30%
-                            bgcolor="#fefefe", 
-                            border_radius=ft.border_radius.only(bottom_left=4, bottom_right=4)
-                        )
-                    ], spacing=0),
-                    width=44,
-                    height=40,
-                    border=ft.border.all(1, "#fbe0e9"), # 框线颜色
-                    border_radius=5,
-                    padding=ft.padding.all(1), # 添加内边距防止遮挡边框
-                    margin=ft.margin.only(top=4) # 留出耳朵位置
-                ),
-                # 两个耳朵 (加宽，线条不粗)
-                ft.Container(
-                    width=7, height=11, # 加宽
-                    bgcolor="#fff7f7", 
-                    border=ft.border.all(1.5, "#fbe0e9"), # 线条微粗但不如之前粗
-                    border_radius=1, 
-                    left=9, top=0
-                ),
-                ft.Container(
-                    width=7, height=11, # 加宽
-                    bgcolor="#fff7f7", 
-                    border=ft.border.all(1.5, "#fbe0e9"), # 线条微粗但不如之前粗
-                    border_radius=1,
-                    left=28, top=0
+                    ],
+                    tight=True,
                 ),
-            ], width=44, height=46),
-            padding=ft.padding.only(right=10)
+                padding=10,
+            ),
         )
+        self.show_overlay(bs)
+
+    def on_export_file_picked(self, e: ft.FilePickerResultEvent):
+        """选择保存位置后开始导出"""
+        if not e.path:
+            return
+        self.export_bill_file(e.path, self.pending_export_format)
+
+    def export_bill_file(self, path: str, fmt: str):
+        """在后台线程中流式导出当前月份的详单，不阻塞界面"""
+        progress_dialog, progress_text = self.show_progress_dialog("下载详单", "正在导出...")
+        month_filter = self.month_filter()
+
+        def on_progress(count):
+            progress_text.value = f"已导出 {count} 条"
+            self.request_update()
+
+        def run():
+            try:
+                count = export_logs(
+                    self.db, path, fmt,
+                    title=f"通话详单 {month_filter['year']}年{month_filter['month']}月",
+                    progress=on_progress,
+                    **month_filter
+                )
+            except Exception as exc:
+                # 除了写文件失败, 读取记录时的 sqlite3.Error 等也在这里提示, 不能让线程带着异常退出
+                logger.warning("导出详单失败: %s", path, exc_info=True)
+                self.show_snackbar(f"导出失败: {exc}", ft.Colors.RED_400)
+                return
+            finally:
+                # 无论成功与否都关闭进度对话框, 否则模态对话框会一直挡住界面
+                self.close_overlay(progress_dialog)
+            self.show_snackbar(f"已导出 {count} 条记录", ft.Colors.GREEN_400)
+
+        self.page.run_thread(run)
+
+    def create_call_item(self, log: dict):
+        """创建通话记录项 - 图2样式 (精简控件树: 每行约19个控件)"""
+        phone_text = ft.Text(log['phone_number'], size=16, weight=ft.FontWeight.W_600, color="#333333", text_align=ft.TextAlign.RIGHT, expand=True)
+        details_text = ft.Text(format_row_details(log), style=ROW_DETAIL_STYLE, text_align=ft.TextAlign.RIGHT, expand=True)
+        direction_color = "#0bb415" if log['is_outgoing'] else "#5fa8f2"
+
+        # 左侧日历小组件: 渐变背景的主体 + 两个耳朵
+        date_badge = ft.Stack([
+            ft.Container(
+                content=ft.Column([
+                    ft.Text(log['call_date'], size=13, color="#e53935", weight=ft.FontWeight.W_500),
+                    ft.Text(format_weekday(log), size=10, color="#888888"),
+                ], spacing=0, alignment=ft.MainAxisAlignment.SPACE_AROUND, horizontal_alignment=ft.CrossAxisAlignment.CENTER),
+                width=44,
+                height=40,
+                gradient=DATE_BADGE_GRADIENT,
+                border=ft.border.all(1, "#fbe0e9"), # 框线颜色
+                border_radius=5,
+                padding=ft.padding.only(top=3),
+                margin=ft.margin.only(top=4) # 留出耳朵位置
+            ),
+            # 两个耳朵 (加宽，线条不粗)
+            ft.Container(width=7, height=11, bgcolor="#fff7f7", border=ft.border.all(1.5, "#fbe0e9"), border_radius=1, left=9, top=0),
+            ft.Container(width=7, height=11, bgcolor="#fff7f7", border=ft.border.all(1.5, "#fbe0e9"), border_radius=1, left=28, top=0),
+        ], width=44, height=46)
 
         # 右侧详情内容
         details = ft.Column([
-                # 第一行: 标题 + 电话号码
-                ft.Container(
-                    content=ft.Row([
-                        ft.Row([
-                            ft.Text("高清语音", size=15, weight=ft.FontWeight.BOLD, color="#333333"),
-                            ft.Row([
-                                create_phone_icon(size=16, color="#0bb415" if log['is_outgoing'] else "#5fa8f2", is_outgoing=log['is_outgoing']),
-                                ft.Text("主叫" if log['is_outgoing'] else "被叫", size=10, weight=ft.FontWeight.W_500, color="#0bb415" if log['is_outgoing'] else "#5fa8f2")
-                            ], spacing=2, vertical_alignment=ft.CrossAxisAlignment.CENTER)
-                        ], spacing=8, vertical_alignment=ft.CrossAxisAlignment.CENTER),
-                        ft.Container(expand=True),
-                        ft.Text(log['phone_number'], size=16, weight=ft.FontWeight.W_600, color="#333333")
-                    ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
-                    margin=ft.margin.only(bottom=5) # 增加底部间距
-                ),
-                
-                # 第二行: 归属地标签 + 归属地值
-                ft.Row([
-                    ft.Text("对方号码归属地", size=13, color="#999999", weight=ft.FontWeight.W_500),
-                    ft.Container(expand=True),
-                    ft.Text(log['location'], size=13, color="#999999", weight=ft.FontWeight.W_500)
-                ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
-                
-                # 接通时间
-                ft.Row([
-                    ft.Text("接通时间:", size=13, color="#999999", weight=ft.FontWeight.W_500),
-                    ft.Container(expand=True),
-                    ft.Text(log['connect_time'], size=13, color="#999999", weight=ft.FontWeight.W_500)
-                ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
-                
-                # 通话时长
-                ft.Row([
-                    ft.Text("通话时长:", size=13, color="#999999", weight=ft.FontWeight.W_500),
-                    ft.Container(expand=True),
-                    ft.Text(duration_text, size=13, color="#999999", weight=ft.FontWeight.W_500)
-                ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
-                
-                # 计费分钟数
-                ft.Row([
-                    ft.Text("计费分钟数:", size=13, color="#999999", weight=ft.FontWeight.W_500),
-                    ft.Container(expand=True),
-                    ft.Text(f"{log['billing_minutes']}分钟", size=13, color="#999999", weight=ft.FontWeight.W_500)
-                ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
-                
-                # 通话费用
+            # 第一行: 标题 + 呼叫类型 + 电话号码
+            ft.Row([
+                ft.Text("高清语音", size=15, weight=ft.FontWeight.BOLD, color="#333333"),
                 ft.Row([
-                    ft.Text("通话费用:", size=13, color="#999999", weight=ft.FontWeight.W_500),
-                    ft.Container(expand=True),
-                    ft.Text(f"¥{log['call_fee']:.2f}", size=13, color="#999999", weight=ft.FontWeight.W_500)
-                ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
-                
-            ], spacing=5, expand=True)
-
-        # 创建通话记录项容器(支持长按)
-        item = ft.Container(
-            content=ft.Row([
-                date_badge,
-                details
+                    create_phone_icon(size=16, is_outgoing=log['is_outgoing']),
+                    ft.Text("主叫" if log['is_outgoing'] else "被叫", size=10, weight=ft.FontWeight.W_500, color=direction_color)
+                ], spacing=2, vertical_alignment=ft.CrossAxisAlignment.CENTER),
+                phone_text,
+            ], spacing=8, vertical_alignment=ft.CrossAxisAlignment.CENTER),
+            # 其余各项: 左侧标签、右侧值
+            ft.Row([
+                ft.Text(ROW_DETAIL_LABELS, style=ROW_DETAIL_STYLE),
+                details_text
             ], vertical_alignment=ft.CrossAxisAlignment.START),
-            padding=ft.padding.symmetric(horizontal=15, vertical=12),
+        ], spacing=10, expand=True)
+
+        # 通话记录项(支持长按), 底部边框作为分割线 (左右留空由外边距实现)
+        # data中保存记录快照和可增量修改的文本控件
+        return ft.Container(
+            content=ft.Row([date_badge, details], spacing=20, vertical_alignment=ft.CrossAxisAlignment.START),
+            padding=ft.padding.symmetric(vertical=12),
+            margin=ft.margin.symmetric(horizontal=15),
             bgcolor=ft.Colors.WHITE,
-            # border=ft.border.only(bottom=ft.BorderSide(0.5, "#f5f5f5")), # 移除旧边框
-            on_long_press=self.on_call_log_long_press(log['id'])
+            border=ft.border.only(bottom=ft.BorderSide(0.5, "#eeeeee")),
+            on_long_press=self.on_call_log_long_press(log['id']),
+            data={'log': dict(log), 'phone': phone_text, 'details': details_text}
         )
-        
-        # 包装容器和分割线
-        return ft.Column([
-            item,
+    
+    def create_month_box(self, month: str, is_selected: bool):
+        """创建月份选择器中的单个月份方块"""
+        inner_box_size = MONTH_BOX_SIZE
+        top_section_height = MONTH_TOP_SECTION_HEIGHT
+        bottom_section_height = MONTH_BOTTOM_SECTION_HEIGHT
+
+        # 统一使用上下分层结构，确保对齐
+        content = ft.Column([
+            ft.Container(
+                content=ft.Text(
+                    month,
+                    size=15,
+                    color="#e94947" if is_selected else "#333333",
+                    # font_family="Arial", # 移除，使用全局字体(微软雅黑)
+                    style=ft.TextStyle(letter_spacing=-1.0)
+                ),
+                bgcolor="#fff5f5" if is_selected else None,
+                alignment=ft.alignment.center,
+                height=top_section_height, # 固定高度
+                width=inner_box_size,
+                # 上半部分圆角 (仅选中时)
+                border_radius=ft.border_radius.only(top_left=5, top_right=5) if is_selected else None
+            ),
             ft.Container(
-                height=0.5, 
-                bgcolor="#eeeeee", 
-                margin=ft.margin.symmetric(horizontal=15) # 左右留空
+                content=ft.Text(
+                    self.current_year,
+                    size=11, # 调小字号
+                    color="#e94947" if is_selected else "#333333", # 统一未选中颜色为深色
+                    # font_family="SimHei", # 移除，使用全局字体(微软雅黑)
+                    style=ft.TextStyle(letter_spacing=0)  # 恢复正常字距
+                ),
+                bgcolor="#fcfcf5" if is_selected else None,
+                alignment=ft.alignment.center,
+                height=bottom_section_height, # 固定高度
+                width=inner_box_size,
+                # 下半部分圆角 (仅选中时)
+                border_radius=ft.border_radius.only(bottom_left=5, bottom_right=5) if is_selected else None
             )
         ], spacing=0)
-    
-    def build_ui(self):
+        
+        inner = ft.Container(
+            content=content,
+            width=inner_box_size,
+            height=inner_box_size,
+            border=ft.border.all(1, "#eb4c46") if is_selected else ft.border.all(1, ft.Colors.TRANSPARENT),
+            border_radius=6,
+            alignment=ft.alignment.center
+        )
+
+        return inner
+
+    async def select_month(self, month: str):
+        """切换月份 - 只加载所选月份的记录"""
+        if month == self.current_month:
+            return
+        previous_month = self.current_month
+        self.current_month = month
+        self.month_buttons[previous_month].content = self.create_month_box(previous_month, False)
+        self.month_buttons[month].content = self.create_month_box(month, True)
+        # 切换月份时取消按日筛选
+        self.day_filter = None
+        self.update_calendar_label()
+
+        # 重置列表并加载新月份的第一页
+        self.request_update()
+        await self.reset_call_list()
+        self.flush_update()
+        self.call_list.scroll_to(offset=0, duration=0)
+
+    def month_click_handler(self, month: str):
+        """生成月份按钮的点击事件处理函数"""
+        async def on_click(e):
+            await self.select_month(month)
+        return on_click
+
+    async def reset_call_list(self):
+        """清空已加载的行并重新加载第一页"""
+        # 先查询再清空，查询期间旧列表保持可见
+        self.list_generation += 1
+        generation = self.list_generation
+        self.last_loaded_log = None
+        logs = await self.db_call(self.db.get_logs_page, **self.next_page_query())
+        if generation != self.list_generation:
+            return  # 查询期间又切换了月份，以最新的一次为准
+        self.call_rows.clear()
+        self.call_list.controls.clear()
+        self.append_page(logs)
+
+    def month_filter(self) -> dict:
+        """当前选择月份对应的查询条件"""
+        return {'year': int(self.current_year), 'month': int(self.current_month.rstrip('月'))}
+
+    def list_filter(self) -> dict:
+        """当前列表的查询条件: 所选月份 + 号码筛选 + 排序/呼叫类型/费用"""
+        return {
+            **self.month_filter(),
+            'query': self.search_query or None,
+            'order': self.list_order,
+            'is_outgoing': self.direction_filter,
+            'fee': self.fee_filter,
+            'day': self.day_filter,
+        }
+
+    def is_in_current_list(self, log: dict) -> bool:
+        """判断记录是否应显示在当前列表中 (属于所选月份且符合各项筛选)"""
+        query = self.search_query.lower()
+        return self.is_in_current_month(log) and (
+            not query
+            or query in str(log.get('phone_number') or '').lower()
+            or query in str(log.get('location') or '').lower()
+        ) and (
+            self.direction_filter is None or int(log.get('is_outgoing', 1)) == self.direction_filter
+        ) and (
+            self.fee_filter is None or (float(log.get('call_fee') or 0) > 0) == (self.fee_filter == 'paid')
+        ) and (
+            self.day_filter is None or log.get('call_date') == self.day_filter
+        )
+
+    async def apply_list_view(self, order: str, is_outgoing, fee):
+        """切换排序/筛选条件
+
+        只切换时间正序/倒序且已加载全部记录时直接倒转现有的行; 否则重新查询已加载范围,
+        按ID复用已创建的行控件, 只创建新出现的行。
+        """
+        reverse_only = (
+            {order, self.list_order} == {'time_desc', 'time_asc'}
+            and is_outgoing == self.direction_filter and fee == self.fee_filter
+            and not self.has_more
+        )
+        self.list_order, self.direction_filter, self.fee_filter = order, is_outgoing, fee
+        self.update_filter_chips()
+        if reverse_only:
+            rows = [control for control in self.call_list.controls if control is not self.list_footer]
+            rows.reverse()
+            self.call_list.controls[:] = rows
+            self.last_loaded_log = rows[-1].data['log'] if rows else None
+            self.update_list_footer()
+        else:
+            # 丢弃按旧条件发起、尚未返回的分页查询
+            self.list_generation += 1
+            await self.refresh_call_list()
+        self.flush_update()
+        self.call_list.scroll_to(offset=0, duration=0)
+
+    async def toggle_time_order(self, e):
+        """顺序 - 在时间倒序/正序之间切换 (按费用排序时回到时间倒序)"""
+        order = 'time_asc' if self.list_order == 'time_desc' else 'time_desc'
+        await self.apply_list_view(order, self.direction_filter, self.fee_filter)
+
+    def show_direction_menu(self, e):
+        """呼叫类型 - 全部/主叫/被叫"""
+        self.show_options_menu(
+            [(title, value, value == self.direction_filter) for title, value in (("全部", None), ("主叫", 1), ("被叫", 0))],
+            lambda value: self.apply_list_view(self.list_order, value, self.fee_filter)
+        )
+
+    def show_fee_menu(self, e):
+        """费用 - 按费用排序或只看收费/免费记录 (值为 (排序方式, 费用筛选))"""
+        fee_order = self.list_order.startswith('fee')
+        time_order = DEFAULT_ORDER if fee_order else self.list_order
+        self.show_options_menu(
+            [
+                ("默认", (time_order, None), not fee_order and self.fee_filter is None),
+                ("费用从高到低", ('fee_desc', self.fee_filter), self.list_order == 'fee_desc'),
+                ("费用从低到高", ('fee_asc', self.fee_filter), self.list_order == 'fee_asc'),
+                ("只看收费记录", (self.list_order, 'paid'), self.fee_filter == 'paid'),
+                ("只看免费记录", (self.list_order, 'free'), self.fee_filter == 'free'),
+            ],
+            lambda value: self.apply_list_view(value[0], self.direction_filter, value[1])
+        )
+
+    def show_options_menu(self, options: list, on_select):
+        """底部选项菜单: options 为 [(标题, 值, 是否选中), ...], 点击后 await on_select(值)"""
+        def choose(value):
+            async def handler(e):
+                self.close_overlay(bs)
+                await on_select(value)
+            return handler
+
+        bs = ft.BottomSheet(
+            ft.Container(
+                ft.Column(
+                    [
+                        ft.ListTile(
+                            leading=ft.Icon(ft.Icons.CHECK if selected else None, color="#eb4c46"),
+                            title=ft.Text(title),
+                            on_click=choose(value)
+                        )
+                        for title, value, selected in options
+                    ],
+                    tight=True,
+                ),
+                padding=10,
+            ),
+        )
+        self.show_overlay(bs)
+
+    def update_filter_chips(self):
+        """根据当前排序/筛选条件更新筛选栏的文字和图标"""
+        if self.list_order == 'time_desc':
+            colors = ("#a3a3a3", "#353535")  # 上浅下深: 倒序
+        elif self.list_order == 'time_asc':
+            colors = ("#353535", "#a3a3a3")  # 上深下浅: 正序
+        else:
+            colors = ("#a3a3a3", "#a3a3a3")  # 按费用排序时两个箭头都为浅色
+        self.sort_icon_box.content = create_sort_icons(size=16, color_up=colors[0], color_down=colors[1])
+
+        direction_names = {None: "呼叫类型", 1: "主叫", 0: "被叫"}
+        self.direction_label.value = direction_names[self.direction_filter]
+        self.direction_label.color = ft.Colors.GREY_600 if self.direction_filter is None else "#3f3f3f"
+
+        fee_active = self.list_order.startswith('fee') or self.fee_filter is not None
+        self.fee_label.color = "#3f3f3f" if fee_active else ft.Colors.GREY_600
+
+    async def on_search_change(self, e):
+        """号码筛选输入 - 防抖后按号码/归属地搜索当前月份"""
+        self.search_generation += 1
+        generation = self.search_generation
+        await asyncio.sleep(SEARCH_DEBOUNCE_DELAY)
+        if generation != self.search_generation:
+            return  # 防抖期间又有输入，只执行最后一次
+        query = e.control.value.strip()
+        if query == self.search_query:
+            return
+        self.search_query = query
+        # 搜索期间再次输入时，reset_call_list 会丢弃过期的结果
+        await self.reset_call_list()
+        if generation == self.search_generation:
+            self.flush_update()
+            self.call_list.scroll_to(offset=0, duration=0)
+
+    async def show_day_picker(self, e):
+        """按日选择 - 当月日历热力图 (每天的通话次数/费用来自日汇总表, 一次查询)"""
+        month_filter = self.month_filter()
+        year, month = month_filter['year'], month_filter['month']
+        day_stats = await self.db_call(self.db.get_day_stats, year, month)
+        max_count = max((stats['call_count'] for stats in day_stats.values()), default=0)
+
+        def choose(day):
+            async def handler(e):
+                self.close_overlay(bs)
+                await self.select_day(day)
+            return handler
+
+        # 周一为每行第一天, 月初之前用空白格补齐
+        first_weekday, days_in_month = calendar.monthrange(year, month)
+        cells = [ft.Container(width=DAY_CELL_SIZE, height=DAY_CELL_SIZE) for _ in range(first_weekday)]
+        for day_number in range(1, days_in_month + 1):
+            day = f"{month:02d}.{day_number:02d}"
+            stats = day_stats.get(day)
+            count = stats['call_count'] if stats else 0
+            selected = day == self.day_filter
+            cells.append(ft.Container(
+                content=ft.Column(
+                    [
+                        ft.Text(str(day_number), size=13, weight=ft.FontWeight.BOLD if selected else None,
+                                color="#3f3f3f" if count < max_count * 0.6 else "#ffffff"),
+                        ft.Text(f"{count}次" if count else "", size=9,
+                                color="#939393" if count < max_count * 0.6 else "#ffffff"),
+                    ],
+                    spacing=0,
+                    alignment=ft.MainAxisAlignment.CENTER,
+                    horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+                ),
+                width=DAY_CELL_SIZE,
+                height=DAY_CELL_SIZE,
+                bgcolor=heat_color(count / max_count) if count else "#f7f7f7",
+                border=ft.border.all(2, "#3f3f3f") if selected else None,
+                border_radius=6,
+                tooltip=f"{count}次通话  ¥{stats['total_fee']:.2f}" if stats else None,
+                on_click=choose(day) if count else None,
+            ))
+
+        month_fee = sum(stats['total_fee'] for stats in day_stats.values())
+        bs = ft.BottomSheet(
+            ft.Container(
+                ft.Column(
+                    [
+                        ft.Row(
+                            [
+                                ft.Text(f"{year}年{month}月  共{sum(s['call_count'] for s in day_stats.values())}次  ¥{month_fee:.2f}",
+                                        size=14, weight=ft.FontWeight.BOLD, color="#3f3f3f"),
+                                ft.TextButton("全月", on_click=choose(None)),
+                            ],
+                            alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+                        ),
+                        ft.Row(
+                            [ft.Container(ft.Text(name, size=11, color="#939393"), width=DAY_CELL_SIZE,
+                                          alignment=ft.alignment.center) for name in WEEKDAY_NAMES],
+                            spacing=DAY_CELL_SPACING,
+                        ),
+                        ft.Row(cells, wrap=True, spacing=DAY_CELL_SPACING, run_spacing=DAY_CELL_SPACING,
+                               width=DAY_CELL_SIZE * 7 + DAY_CELL_SPACING * 6),
+                    ],
+                    tight=True,
+                    horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+                ),
+                padding=16,
+            ),
+        )
+        self.show_overlay(bs)
+
+    async def show_stats_dashboard(self, e):
+        """账单统计 - 当月每天的通话、主叫/被叫、常用联系人、归属地费用和时长分布 (只读取汇总表, 不扫描记录)"""
+        month_filter = self.month_filter()
+        year, month = month_filter['year'], month_filter['month']
+        dashboard = await self.db_call(self.db.get_month_dashboard, year, month)
+        totals = dashboard['totals']
+
+        # 每日通话次数柱状图
+        day_stats = dashboard['days']
+        max_count = max((stats['call_count'] for stats in day_stats.values()), default=0)
+        day_bars = []
+        for day_number in range(1, calendar.monthrange(year, month)[1] + 1):
+            day = f"{month:02d}.{day_number:02d}"
+            count = day_stats[day]['call_count'] if day in day_stats else 0
+            day_bars.append(ft.Container(
+                width=STATS_DAY_BAR_WIDTH,
+                height=max(STATS_DAY_BAR_HEIGHT * count / max_count, 1) if count else 0,
+                bgcolor=STATS_BAR_COLOR,
+                border_radius=2,
+                tooltip=f"{day}  {count}次  ¥{day_stats[day]['total_fee']:.2f}" if count else None,
+            ))
+
+        # 主叫/被叫占比
+        outgoing, incoming = dashboard['direction'][1], dashboard['direction'][0]
+        direction_bar = ft.Row(
+            [
+                ft.Container(expand=stats['call_count'], height=10, bgcolor=color)
+                for stats, color in ((outgoing, OUTGOING_COLOR), (incoming, INCOMING_COLOR)) if stats['call_count']
+            ],
+            spacing=0,
+        )
+
+        contacts = dashboard['top_contacts']
+        locations = dashboard['locations']
+        durations = dashboard['durations']
+        sections = [
+            ft.Text(
+                f"{year}年{month}月  共{totals['call_count']}次  ¥{totals['total_fee']:.2f}  "
+                f"{format_total_duration(totals['total_duration'])}",
+                size=14, weight=ft.FontWeight.BOLD, color="#3f3f3f",
+            ),
+            self.stats_section("每日通话", [ft.Row(
+                day_bars, spacing=2, height=STATS_DAY_BAR_HEIGHT, vertical_alignment=ft.CrossAxisAlignment.END
+            )]),
+            self.stats_section("主叫 / 被叫", [
+                direction_bar,
+                ft.Row([
+                    ft.Text(f"主叫 {outgoing['call_count']}次  ¥{outgoing['total_fee']:.2f}", size=12, color=OUTGOING_COLOR),
+                    ft.Text(f"被叫 {incoming['call_count']}次  ¥{incoming['total_fee']:.2f}", size=12, color=INCOMING_COLOR),
+                ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
+            ]),
+            self.stats_section("常用联系人", [
+                self.stats_bar_row(
+                    contact['phone_number'], f"{contact['call_count']}次  {format_total_duration(contact['total_duration'])}",
+                    contact['call_count'] / contacts[0]['call_count'],
+                ) for contact in contacts
+            ]),
+            self.stats_section("归属地费用", [
+                self.stats_bar_row(
+                    location['location'] or "未知", f"¥{location['total_fee']:.2f}",
+                    location['total_fee'] / locations[0]['total_fee'] if locations[0]['total_fee'] else 0,
+                ) for location in locations
+            ]),
+            self.stats_section("通话时长分布", [
+                self.stats_bar_row(label, f"{count}次", count / max(durations) if count else 0)
+                for label, count in zip(DURATION_BUCKET_LABELS, durations)
+            ]),
+        ]
+        bs = ft.BottomSheet(
+            ft.Container(
+                ft.Column(sections, tight=True, spacing=14, scroll=ft.ScrollMode.AUTO),
+                padding=16,
+            ),
+            is_scroll_controlled=True,
+        )
+        self.show_overlay(bs)
+
+    def stats_section(self, title: str, controls: list):
+        """统计页的一个分区: 标题 + 内容 (没有数据时显示"暂无数据")"""
+        return ft.Column(
+            [ft.Text(title, size=13, weight=ft.FontWeight.BOLD, color="#3f3f3f")]
+            + (controls or [ft.Text("暂无数据", size=12, color="#939393")]),
+            spacing=6,
+        )
+
+    def stats_bar_row(self, label: str, value: str, ratio: float):
+        """统计页的一行条形图: 名称 | 按 ratio 缩放的条 | 数值"""
+        return ft.Row(
+            [
+                ft.Text(label, size=12, color="#3f3f3f", width=90, no_wrap=True),
+                ft.Container(width=max(STATS_BAR_WIDTH * ratio, 2), height=10, bgcolor=STATS_BAR_COLOR, border_radius=2),
+                ft.Text(value, size=12, color="#939393"),
+            ],
+            spacing=8,
+        )
+
+    async def select_day(self, day: str):
+        """只显示所选日期的记录 (day 为 None 时恢复全月), 按 (年, 日期) 索引范围查询"""
+        if day == self.day_filter:
+            return
+        self.day_filter = day
+        self.update_calendar_label()
+        await self.reset_call_list()
+        self.flush_update()
+        self.call_list.scroll_to(offset=0, duration=0)
+
+    def update_calendar_label(self):
+        """按日选择按钮的文字: 选中日期时显示 "MM.DD" """
+        self.calendar_label.value = self.day_filter or "按日选择"
+
+    def is_in_current_month(self, log: dict) -> bool:
+        """判断记录是否属于当前选择的月份"""
+        month_filter = self.month_filter()
+        return (
+            int(log.get('year') or month_filter['year']) == month_filter['year']
+            and int(str(log['call_date']).split('.')[0]) == month_filter['month']
+        )
+
+    def build_ui(self, warm_up: StartupWarmUp):
         """构建用户界面"""
+        profiler.start_laps("build_ui")
         
         # 费用统计文本
-        total_fee = self.db.get_total_fee()
-        self.fee_text = ft.Text(f"{total_fee:.2f}元", size=20, weight=ft.FontWeight.BOLD, color="#fbfffd")
+        self.fee_text = ft.Text(f"{warm_up.total_fee:.2f}元", size=20, weight=ft.FontWeight.BOLD, color="#fbfffd")
         
         # 头部区域 (包含顶部导航、费用统计、Tab栏)
         # 合并为一个容器以统一背景和消除间距
@@ -1097,7 +2115,8 @@ class CallLogApp:
                         content=ft.Text("查账单", size=12, color="#fffbeb"),
                         border=ft.border.all(0.8, "#fffbeb"),  # 边框调细
                         padding=ft.padding.symmetric(horizontal=15, vertical=6),
-                        border_radius=15
+                        border_radius=15,
+                        on_click=self.show_stats_dashboard
                     )
                 ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN, vertical_alignment=ft.CrossAxisAlignment.CENTER),
                 padding=ft.padding.symmetric(horizontal=20, vertical=10) # 减小上下间距
@@ -1160,77 +2179,35 @@ class CallLogApp:
             )
         )
         
+        profiler.lap("build_ui", "header")
+        
         # 月份选择器
         months = ["12月", "11月", "10月", "9月", "8月", "7月", "6月"]
         
-        # 内部方块大小 (固定以保持正方形，外层自适应)
-        inner_box_size = 48 # 调大一点，减少间距
-        top_section_height = 26 # 再次微调高度，留出边框
-        bottom_section_height = 15 # 再次微调高度
+        inner_box_size = MONTH_BOX_SIZE
+        top_section_height = MONTH_TOP_SECTION_HEIGHT
+        bottom_section_height = MONTH_BOTTOM_SECTION_HEIGHT
         
         selector_controls = []
         
-        # 添加月份按钮
+        # 添加月份按钮 (外层容器按月份保存，切换月份时只替换内容)
+        self.month_buttons = {}
         for month in months:
-            is_selected = month == self.current_month
-            
-            # 统一使用上下分层结构，确保对齐
-            content = ft.Column([
-                ft.Container(
-                    content=ft.Text(
-                        month,
-                        size=15,
-                        color="#e94947" if is_selected else "#333333",
-                        # font_family="Arial", # 移除，使用全局字体(微软雅黑)
-                        style=ft.TextStyle(letter_spacing=-1.0)
-                    ),
-                    bgcolor="#fff5f5" if is_selected else None,
-                    alignment=ft.alignment.center,
-                    height=top_section_height, # 固定高度
-                    width=inner_box_size,
-                    # 上半部分圆角 (仅选中时)
-                    border_radius=ft.border_radius.only(top_left=5, top_right=5) if is_selected else None
-                ),
-                ft.Container(
-                    content=ft.Text(
-                        self.current_year,
-                        size=11, # 调小字号
-                        color="#e94947" if is_selected else "#333333", # 统一未选中颜色为深色
-                        # font_family="SimHei", # 移除，使用全局字体(微软雅黑)
-                        style=ft.TextStyle(letter_spacing=0)  # 恢复正常字距
-                    ),
-                    bgcolor="#fcfcf5" if is_selected else None,
-                    alignment=ft.alignment.center,
-                    height=bottom_section_height, # 固定高度
-                    width=inner_box_size,
-                    # 下半部分圆角 (仅选中时)
-                    border_radius=ft.border_radius.only(bottom_left=5, bottom_right=5) if is_selected else None
-                )
-            ], spacing=0)
-            
-            inner = ft.Container(
-                content=content,
-                width=inner_box_size,
-                height=inner_box_size,
-                border=ft.border.all(1, "#eb4c46") if is_selected else ft.border.all(1, ft.Colors.TRANSPARENT),
-                border_radius=6,
-                alignment=ft.alignment.center
-            )
-            
             # 外层自适应容器
-            selector_controls.append(
-                ft.Container(
-                    content=inner,
-                    expand=1,
-                    alignment=ft.alignment.center
-                )
+            self.month_buttons[month] = ft.Container(
+                content=self.create_month_box(month, month == self.current_month),
+                expand=1,
+                alignment=ft.alignment.center,
+                on_click=self.month_click_handler(month)
             )
+            selector_controls.append(self.month_buttons[month])
             
         # # 添加间隔 (月份与日历之间的间隔稍大)
         # selector_controls.append(ft.Container(width=15)) # 加大间隔
         
         # 添加日历按钮
         # 为了实现“按日选择”与“2025”底部水平一致，采用相同的布局结构
+        self.calendar_label = ft.Text("按日选择", size=10, color="#e57d80")
         calendar_inner = ft.Container(
             content=ft.Column([
                 # 上半部分：放图标
@@ -1242,7 +2219,7 @@ class CallLogApp:
                 ),
                 # 下半部分：放文字
                 ft.Container(
-                    content=ft.Text("按日选择", size=10, color="#e57d80"), # 字体微调为10以防溢出
+                    content=self.calendar_label, # 字体微调为10以防溢出
                     alignment=ft.alignment.center,
                     height=bottom_section_height,
                     width=60
@@ -1257,7 +2234,8 @@ class CallLogApp:
             ft.Container(
                 content=calendar_inner,
                 expand=1, # 保持自适应，但内容容器较宽
-                alignment=ft.alignment.center
+                alignment=ft.alignment.center,
+                on_click=self.show_day_picker
             )
         )
 
@@ -1275,6 +2253,29 @@ class CallLogApp:
             padding=ft.padding.only(left=10, right=10, top=10, bottom=5)
         )
         
+        profiler.lap("build_ui", "month_selector")
+        
+        # 号码筛选输入框 (无边框，提示文字与原来的"号码筛选"一致)
+        self.search_field = ft.TextField(
+            hint_text="号码筛选",
+            hint_style=ft.TextStyle(size=14, color="#c8c8c8"),
+            text_size=14,
+            color="#333333",
+            border=ft.InputBorder.NONE,
+            dense=True,
+            content_padding=0,
+            cursor_color="#eb4c46",
+            height=20,
+            expand=True,
+            on_change=self.on_search_change
+        )
+
+        # 筛选栏中随排序/筛选条件变化的控件 (由 update_filter_chips 设置内容)
+        self.sort_icon_box = ft.Container(alignment=ft.alignment.center)
+        self.direction_label = ft.Text(size=12) # 字体缩小到12
+        self.fee_label = ft.Text("费用", size=12)
+        self.update_filter_chips()
+
         # 筛选器栏 - 仿照图2重构
         filter_bar = ft.Container(
             content=ft.Row([
@@ -1282,38 +2283,35 @@ class CallLogApp:
                 ft.Container(
                     content=ft.Row([
                         ft.Text("顺序", size=12, color="#3f3f3f"), 
-                        ft.Container(
-                            content=create_sort_icons(size=16, color_up="#a3a3a3", color_down="#353535"), # 颜色互换：上浅下深
-                            alignment=ft.alignment.center
-                        )
+                        self.sort_icon_box
                     ], spacing=2),
-                    on_click=lambda e: print("顺序 clicked")
+                    on_click=self.toggle_time_order
                 ),
                 
                 # 2. 呼叫类型 (灰色下拉箭头)
                 ft.Container(
                     content=ft.Row([
-                        ft.Text("呼叫类型", size=12, color=ft.Colors.GREY_600), # 字体缩小到12
+                        self.direction_label,
                         ft.Container(width=2), # 微小间距
                         create_dropdown_icon(size=8, color=ft.Colors.GREY_400) # 使用自定义下拉图标，等边三角形
                     ], spacing=0, vertical_alignment=ft.CrossAxisAlignment.CENTER), 
-                    on_click=lambda e: print("呼叫类型 clicked")
+                    on_click=self.show_direction_menu
                 ),
                 
                 # 3. 费用 (灰色下拉箭头)
                 ft.Container(
                     content=ft.Row([
-                        ft.Text("费用", size=12, color=ft.Colors.GREY_600), # 字体缩小到12
+                        self.fee_label,
                         ft.Container(width=2), # 微小间距
                         create_dropdown_icon(size=8, color=ft.Colors.GREY_400) # 使用自定义下拉图标
                     ], spacing=0, vertical_alignment=ft.CrossAxisAlignment.CENTER), 
-                    on_click=lambda e: print("费用 clicked")
+                    on_click=self.show_fee_menu
                 ),
                 
-                # 4. 号码筛选 (胶囊搜索框)
+                # 4. 号码筛选 (胶囊搜索框，输入时按号码/归属地搜索)
                 ft.Container(
                     content=ft.Row([
-                        ft.Text("号码筛选", size=14, color="#c8c8c8"), # 字号调大到14
+                        self.search_field,
                         ft.Row([
                             ft.Text("|", size=14, color="#e0e0e0"), 
                             create_search_icon(size=16, color="#939393", stroke_width=1.8), 
@@ -1323,48 +2321,41 @@ class CallLogApp:
                     padding=ft.padding.symmetric(horizontal=10, vertical=3), # 垂直padding微增，水平padding微减
                     border_radius=15,
                     width=120, # 宽度缩短
-                    on_click=lambda e: print("号码筛选 clicked")
+                    on_click=lambda e: self.search_field.focus()
                 )
             ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
             padding=ft.padding.symmetric(horizontal=15, vertical=10),
             border=ft.border.only(bottom=ft.BorderSide(1, "#f0f0f0")) # 边框颜色更浅
         )
         
-        # 通话记录列表
-        logs = self.db.get_all_logs()
-        self.call_list = ft.Column([], spacing=0)
+        profiler.lap("build_ui", "filter_bar")
         
-        for log in logs:
-            self.call_list.controls.append(self.create_call_item(log))
+        # 详单导入文件选择器 (FilePicker 需要放在 overlay 中)
+        self.import_file_picker = ft.FilePicker(on_result=self.on_import_file_picked)
+        self.page.overlay.append(self.import_file_picker)
+        # 详单导出保存位置选择器
+        self.export_file_picker = ft.FilePicker(on_result=self.on_export_file_picked)
+        self.page.overlay.append(self.export_file_picker)
+        self.pending_export_format = 'csv'
+
+        # 通话记录列表 - 虚拟化ListView, 只加载第一页，滚动到底部时再加载下一页
+        self.call_list = ft.ListView(
+            spacing=0,
+            expand=True,
+            on_scroll=self.on_list_scroll,
+            on_scroll_interval=50
+        )
+        self.list_footer = self.create_list_footer()
+        # 第一页数据已在启动预热中读取，首屏直接显示记录
+        self.append_page(warm_up.first_page)
+
+        profiler.lap("build_ui", "first_page_rows")
         
-        # 添加底部提示："没有更多了"
-        if logs:  # 只有当有记录时才显示
-            self.call_list.controls.append(
-                ft.Column([
-                    # 分割线
-                    ft.Container(
-                        height=0.5,
-                        bgcolor="#eeeeee",
-                        margin=ft.margin.symmetric(horizontal=15)
-                    ),
-                    # "没有更多了"文字
-                    ft.Container(
-                        content=ft.Text(
-                            "没有更多了",
-                            size=13,
-                            color="#999999",
-                            weight=ft.FontWeight.W_500
-                        ),
-                        alignment=ft.alignment.center,
-                        padding=ft.padding.symmetric(vertical=15)
-                    )
-                ], spacing=0)
-            )
+        # 数据库操作较慢时显示的加载进度条
+        self.loading_bar = ft.ProgressBar(height=2, color="#eb4c46", bgcolor=ft.Colors.TRANSPARENT, visible=False)
         
         # 列表容器 - 去除背景，直接作为Column的一部分
-        call_list_column = ft.Column([
-                self.call_list
-            ], scroll=ft.ScrollMode.HIDDEN, expand=True)
+        call_list_column = self.call_list
         
         # 底部功能栏
         bottom_bar = ft.Container(
@@ -1375,7 +2366,10 @@ class CallLogApp:
                 ft.Text("|", size=12, color=ft.Colors.GREY_400),
                 ft.Text("满意度调查", size=12, color=ft.Colors.GREY_600),
                 ft.Text("|", size=12, color=ft.Colors.GREY_400),
-                ft.Text("下载详单", size=12, color=ft.Colors.GREY_600)
+                ft.Container(
+                    content=ft.Text("下载详单", size=12, color=ft.Colors.GREY_600),
+                    on_click=lambda e: self.show_export_menu()
+                )
             ], alignment=ft.MainAxisAlignment.CENTER),
             height=60, # 加高
             alignment=ft.alignment.top_center, # 内容靠上
@@ -1394,6 +2388,7 @@ class CallLogApp:
             content=ft.Column([
                 month_selector,
                 filter_bar,
+                self.loading_bar,
                 call_list_column, # 移除 show_name_toggle
                 bottom_bar
             ], spacing=0, expand=True),
@@ -1402,6 +2397,8 @@ class CallLogApp:
             expand=True
         )
         
+        profiler.lap("build_ui", "bottom")
+        
         # 组装整个页面
         self.page.add(
             ft.Column([
@@ -1409,9 +2406,11 @@ class CallLogApp:
                 content_container
             ], spacing=0, expand=True)
         )
+        profiler.lap("build_ui", "page_add")
+        profiler.mark("first_update")
 
 
-def main(page: ft.Page):
+async def main(page: ft.Page):
     """主函数 - 带启动屏"""
     # 隐藏标题栏和窗口控件
     page.title = "中国联通"
@@ -1441,17 +2440,33 @@ def main(page: ft.Page):
     )
     
     # 显示启动屏
+    started = time.perf_counter()
     page.add(splash_screen)
     page.update()
+    profiler.mark("splash_update")
     
-    # 等待1.5秒
-    time.sleep(1.5)
+    # 启动屏显示期间在后台并行预热，完成后立即进入 (不少于最短显示时长)
+    warm_up = StartupWarmUp()
+    with profiler.phase("warm_up", "startup"):
+        await warm_up.run()
+    remaining = SPLASH_MIN_DURATION - (time.perf_counter() - started)
+    if remaining > 0:
+        await asyncio.sleep(remaining)
     
     # 清除启动屏，加载主应用
     page.controls.clear()
-    CallLogApp(page)
+    build_started = time.perf_counter()
+    with profiler.phase("CallLogApp", "startup"):
+        CallLogApp(page, warm_up)
+    logger.info(
+        "构建界面: %.1f ms, 启动总耗时: %.1f ms",
+        (time.perf_counter() - build_started) * 1000, (time.perf_counter() - started) * 1000
+    )
+    # 启动分析开启时写出追踪文件和汇总
+    profiler.finish()
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
     ft.app(target=main)
 
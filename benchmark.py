@@ -0,0 +1,281 @@
+"""
+通话详单查看器 - 性能基准测试
+用合成数据填充临时数据库, 在模拟的 Page 上驱动 CallLogApp, 统计耗时、内存分配和控件树序列化大小
+
+    python benchmark.py                         运行全部基准 (1k/10k/100k 条)
+    python benchmark.py --sizes 1000 10000      指定数据规模
+    python benchmark.py --compare benchmark_results/xxx.json   与之前的结果对比
+
+结果保存到 benchmark_results/<时间>-<提交>.json, 便于在不同提交之间对比。
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from flet.core.protocol import CommandEncoder
+
+import Flet_app
+from database import CallLogDatabase, DatabaseWorker, PAGE_SIZE
+
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+RESULTS_DIR = "benchmark_results"
+# 刷新列表基准中最多预先加载到列表的行数 (10万行控件全部常驻内存没有实际意义)
+MAX_LOADED_ROWS = 10000
+# 单行构建基准中构建的行数
+ROW_SAMPLE_SIZE = 1000
+
+
+class BenchmarkPage:
+    """模拟的 ft.Page: 只保存控件, update() 不发送任何数据"""
+
+    def __init__(self):
+        self.controls = []
+        self.overlay = []
+        self.window = type("Window", (), {})()
+        self.update_count = 0
+
+    def update(self, *controls):
+        self.update_count += 1
+
+    def add(self, *controls):
+        self.controls.extend(controls)
+        self.update()
+
+    def open(self, control):
+        self.overlay.append(control)
+
+    def close(self, control):
+        pass
+
+    def run_thread(self, handler, *args):
+        handler(*args)
+
+
+def control_tree_stats(control) -> dict:
+    """控件树的控件数量和首次发送到客户端的序列化大小 (字节)"""
+    commands = control._build_add_commands()
+    payload = json.dumps(commands, cls=CommandEncoder, separators=(',', ':'))
+    return {'controls': len(commands), 'bytes': len(payload.encode('utf-8'))}
+
+
+def synthetic_logs(count: int, seed: int = 2025, year: int = 2025, month: int = 12):
+    """生成可复现的合成通话记录 (全部落在同一个月, 对应界面默认月份)"""
+    rng = random.Random(seed)
+    start = datetime(year, month, 1)
+    for _ in range(count):
+        moment = start + timedelta(seconds=rng.randrange(28 * 24 * 3600))
+        duration = rng.choice((0, rng.randrange(1, 60), rng.randrange(60, 3600)))
+        yield {
+            'phone_number': f"1{rng.randrange(3, 10)}{rng.randrange(10 ** 9):09d}",
+            'location': rng.choice(('福建福州', '湖南长沙', '广东深圳', '北京')),
+            'connect_time': moment.strftime("%H:%M"),
+            'call_duration': duration,
+            'billing_minutes': (duration + 59) // 60,
+            'call_fee': round(rng.choice((0, 0, 0.1, 0.15)) * ((duration + 59) // 60), 2),
+            'call_date': moment.strftime("%m.%d"),
+            'call_time': moment.strftime("%H:%M"),
+            'is_outgoing': rng.randrange(2),
+            'year': year,
+        }
+
+
+def seed_database(path: str, count: int) -> CallLogDatabase:
+    """创建并填充合成数据库"""
+    db = CallLogDatabase(path)
+    db.add_call_logs_bulk(synthetic_logs(count))
+    return db
+
+
+def measure(func, repeat: int = 5) -> dict:
+    """多次执行 func, 返回耗时 (毫秒) 和单次执行的内存分配峰值 (KB)"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def create_app(db: CallLogDatabase, loaded_rows: int = PAGE_SIZE):
+    """在模拟 Page 上构建 CallLogApp, 并预先加载 loaded_rows 行"""
+    warm_up = Flet_app.StartupWarmUp()
+    warm_up.db = db
+    warm_up.db_worker = DatabaseWorker(db)
+    warm_up.top_phone_number = db.get_config("top_phone_number", "")
+    warm_up.total_fee = db.get_total_fee()
+    warm_up.first_page = db.get_logs_page(limit=PAGE_SIZE + 1, year=2025, month=12)
+    app = Flet_app.CallLogApp(BenchmarkPage(), warm_up)
+    while len(app.call_rows) < loaded_rows and app.has_more:
+        app.append_page(db.get_logs_page(**app.next_page_query()))
+    return app
+
+
+def bench_rows(db: CallLogDatabase) -> dict:
+    """create_call_item 单行构建: 耗时、分配和每行控件数/序列化大小"""
+    app = create_app(db)
+    logs = db.get_logs_page(limit=ROW_SAMPLE_SIZE, year=2025, month=12)
+    result = measure(lambda: [app.create_call_item(log) for log in logs], repeat=3)
+    per_row = len(logs) or 1
+    tree = control_tree_stats(app.create_call_item(logs[0]))
+    return {
+        'rows': len(logs),
+        'per_row_us': round(result['min_ms'] * 1000 / per_row, 2),
+        'peak_kb_per_row': round(result['peak_kb'] / per_row, 2),
+        'controls_per_row': tree['controls'],
+        'bytes_per_row': tree['bytes'],
+        **result,
+    }
+
+
+def bench_scale(size: int) -> dict:
+    """在 size 条记录的数据库上测试查询和刷新列表"""
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        db = seed_database(os.path.join(directory, "bench.db"), size)
+        seed_ms = (time.perf_counter() - started) * 1000
+
+        result = {
+            'seed_ms': round(seed_ms, 1),
+            'get_all_logs': measure(db.get_all_logs, repeat=3),
+            'get_total_fee': measure(db.get_total_fee),
+            'get_logs_by_month': measure(lambda: db.get_logs_by_month(2025, 12)),
+        }
+
+        loaded_rows = min(size, MAX_LOADED_ROWS)
+        started = time.perf_counter()
+        app = create_app(db, loaded_rows)
+        result['build_ui_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        result['loaded_rows'] = len(app.call_rows)
+        result['refresh_call_list'] = measure(lambda: asyncio.run(app.refresh_call_list()), repeat=3)
+        result['page_tree'] = control_tree_stats(app.page.controls[0])
+        app.db_worker.close()
+        if size == min(DEFAULT_SIZES):
+            result['create_call_item'] = bench_rows(db)
+        db.close()
+    return result
+
+
+def bench_canvas() -> dict:
+    """图标/图形工厂: 缓存未命中与命中时的耗时"""
+    factories = {
+        'star': lambda: Flet_app.create_star_canvas(size=24, color="#000000", stroke_width=2),
+        'arrow': lambda: Flet_app.create_arrow_canvas(size=22, color="#000000", stroke_width=2),
+        'fingerprint': lambda: Flet_app.create_fingerprint_pattern(width=350, height=200),
+        'calendar': lambda: Flet_app.create_calendar_icon(size=25, color="#e57d80", bg_color="#ffdee3"),
+        'search': lambda: Flet_app.create_search_icon(size=16, color="#939393", stroke_width=1.8),
+        'sort': lambda: Flet_app.create_sort_icons(size=16, color_up="#a3a3a3", color_down="#353535"),
+        'dropdown': lambda: Flet_app.create_dropdown_icon(size=8, color="#bdbdbd"),
+        'phone': lambda: Flet_app.create_phone_icon(size=16, is_outgoing=True),
+    }
+    caches = (
+        Flet_app.star_shape_specs, Flet_app.arrow_shape_specs, Flet_app.fingerprint_shape_specs,
+        Flet_app.calendar_shape_specs, Flet_app.search_shape_specs, Flet_app.sort_shape_specs,
+        Flet_app.dropdown_shape_specs,
+    )
+
+    def clear_caches():
+        for cache in caches:
+            cache.cache_clear()
+
+    results = {}
+    for name, factory in factories.items():
+        results[name] = {
+            'cold': measure(lambda: (clear_caches(), factory())),
+            'warm': measure(factory),
+            **control_tree_stats(factory()),
+        }
+    return results
+
+
+def git_revision() -> str:
+    """当前提交的短哈希 (不在git仓库中时返回 unknown)"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def flatten(result, prefix: str = "") -> dict:
+    """把嵌套结果展开为 "a.b.c" -> 数值, 用于对比"""
+    items = {}
+    for key, value in result.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            items.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            items[name] = value
+    return items
+
+
+def compare(previous: dict, current: dict):
+    """输出与之前结果的差异 (只列出耗时/内存/大小指标)"""
+    old = flatten(previous['results'])
+    new = flatten(current['results'])
+    print(f"\n对比 {previous['revision']} -> {current['revision']}")
+    for name in sorted(new.keys() & old.keys()):
+        if not name.endswith(('min_ms', 'peak_kb', 'controls', 'bytes', 'per_row_us', 'controls_per_row', 'bytes_per_row')):
+            continue
+        before, after = old[name], new[name]
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"  {name:60s} {before:>12.2f} -> {after:>12.2f}  ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="通话详单查看器性能基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="数据库记录条数")
+    parser.add_argument("--output", help="结果文件路径 (默认保存到 benchmark_results/)")
+    parser.add_argument("--compare", help="与之前保存的结果文件对比")
+    args = parser.parse_args()
+
+    revision = git_revision()
+    results = {'canvas': bench_canvas()}
+    for size in args.sizes:
+        print(f"基准测试: {size} 条记录 ...", flush=True)
+        results[f"rows_{size}"] = bench_scale(size)
+
+    report = {
+        'revision': revision,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{revision}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    print(f"\n结果已保存到 {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1181 @@
+"""
+通话详单查看器 - 数据库模块
+SQLite存储通话记录, 表结构与 lib/services/database_service.dart 保持一致
+"""
+import asyncio
+import bisect
+import functools
+import itertools
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+
+logger = logging.getLogger("call_log.database")
+
+# 通话记录字段 (不含自增id)
+LOG_COLUMNS = (
+    'phone_number', 'call_type', 'location', 'connect_time', 'call_duration',
+    'billing_minutes', 'call_fee', 'call_date', 'call_time', 'is_hd_voice',
+    'is_outgoing', 'weekday', 'year', 'call_at'
+)
+
+# 与表结构一致的字段默认值 (批量写入时整列插入, 需自行补齐)
+LOG_DEFAULTS = {
+    'call_type': '高清语音',
+    'location': '福建福州',
+    'call_duration': 0,
+    'billing_minutes': 0,
+    'call_fee': 0.0,
+    'is_hd_voice': 1,
+    'is_outgoing': 1,
+}
+
+# 数据库结构版本 (PRAGMA user_version)
+SCHEMA_VERSION = 10
+
+# 旧数据没有年份字段时使用的年份 (与界面默认年份一致)
+DEFAULT_YEAR = 2025
+
+# 列表分页默认每页条数
+PAGE_SIZE = 50
+
+# 批量导入时每个事务写入的条数
+BULK_BATCH_SIZE = 5000
+
+# 导出等流式读取时每次从游标取出的条数
+ITER_BATCH_SIZE = 1000
+
+# 撤销日志最多保留的删除批次, 更早批次的记录在后台整理时物理删除
+UNDO_JOURNAL_SIZE = 20
+
+# 删除/清空后可以撤销的时长 (秒, 不短于界面"撤销"提示的显示时长), 过期的批次同样在后台整理时物理删除
+UNDO_WINDOW = 20
+
+# 后台整理后空闲页占比超过该值时执行 VACUUM
+VACUUM_FREE_RATIO = 0.25
+
+# 默认数据库文件
+DEFAULT_DB_PATH = "call_logs.db"
+
+# 读线程数 (每个读线程一个连接, WAL 模式下并发读取互不阻塞)
+READER_THREADS = 4
+
+# 等待其他连接释放写锁的最长时间 (秒)
+BUSY_TIMEOUT = 10.0
+
+# 变更通知中最多逐条列出的记录id, 超过时 (批量导入、撤销清空等) 只通知整体刷新
+CHANGE_FEED_MAX_IDS = 200
+
+# 变更通知中逐条列出id的变更类型
+CHANGE_KINDS = ('inserted', 'updated', 'deleted')
+
+# 未删除 (没有墓碑标记) 的记录
+LIVE_LOG_CONDITION = "call_logs.deleted_batch IS NULL"
+
+# 计入汇总表的记录: 未删除且 call_at 有效; 日期/时间无法解析的旧记录不会出现在任何月份/日期的列表中, 也不计入汇总
+COUNTED_LOG_CONDITION = f"{LIVE_LOG_CONDITION} AND call_logs.call_at IS NOT NULL"
+
+# call_at 的起点: 年月日时分按本地时间直接换算为秒数, 不涉及时区, 只用于比较和范围查询
+CALL_AT_EPOCH = datetime(1970, 1, 1)
+
+# 撤销日志中已过期 (超过 UNDO_WINDOW) 的批次; created_at 为 CURRENT_TIMESTAMP 写入的 UTC 时间
+UNDO_EXPIRED_CONDITION = f"undo_journal.created_at < datetime('now', '-{UNDO_WINDOW} seconds')"
+
+# v8 迁移回填 call_at 的进度 (已回填到的id), 回填完成后删除
+CALL_AT_BACKFILL_KEY = 'call_at_backfill_id'
+
+# 汇总表中表示"全部月份"的 (年, 月)
+ALL_MONTHS = (0, 0)
+
+# 通话时长区间的下限 (秒): 区间 0 为未接通, 之后依次为 [1, 60), [60, 180) ... [1800, ∞)
+DURATION_BUCKET_EDGES = (1, 60, 180, 600, 1800)
+
+# 按月多维汇总 (call_rollups) 的维度 -> 由记录计算维度值的 SQL 表达式 (与 rollup_keys() 一致)
+ROLLUP_EXPRESSIONS = {
+    'direction': "CAST(COALESCE(is_outgoing, 0) AS INTEGER)",
+    'phone': "COALESCE(phone_number, '')",
+    'location': "COALESCE(location, '')",
+    'duration': "CASE {} ELSE {} END".format(
+        " ".join(f"WHEN COALESCE(call_duration, 0) < {edge} THEN {index}"
+                 for index, edge in enumerate(DURATION_BUCKET_EDGES)),
+        len(DURATION_BUCKET_EDGES)
+    ),
+}
+
+# 统计页默认列出的常用联系人/归属地条数
+STATS_TOP_COUNT = 10
+
+# 列表排序方式 -> (排序字段, 是否倒序); 均以id结尾保证顺序稳定, 同时作为键集分页的游标
+SORT_ORDERS = {
+    'time_desc': (('call_at', 'id'), True),
+    'time_asc': (('call_at', 'id'), False),
+    'fee_desc': (('call_fee', 'call_at', 'id'), True),
+    'fee_asc': (('call_fee', 'call_at', 'id'), False),
+}
+DEFAULT_ORDER = 'time_desc'
+
+# 费用筛选 -> 查询条件
+FEE_FILTERS = {
+    'paid': "call_logs.call_fee > 0",
+    'free': "call_logs.call_fee = 0",
+}
+
+# 三元组全文索引能匹配的最短查询长度, 更短的查询退回 LIKE 匹配
+FTS_MIN_QUERY_LENGTH = 3
+
+# 全文索引与 call_logs 保持同步的触发器
+SEARCH_INDEX_TRIGGERS = (
+    '''
+    CREATE TRIGGER IF NOT EXISTS call_logs_fts_insert AFTER INSERT ON call_logs BEGIN
+        INSERT INTO call_logs_fts (rowid, phone_number, location)
+        VALUES (new.id, new.phone_number, new.location);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS call_logs_fts_delete AFTER DELETE ON call_logs BEGIN
+        INSERT INTO call_logs_fts (call_logs_fts, rowid, phone_number, location)
+        VALUES ('delete', old.id, old.phone_number, old.location);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS call_logs_fts_update AFTER UPDATE OF phone_number, location ON call_logs BEGIN
+        INSERT INTO call_logs_fts (call_logs_fts, rowid, phone_number, location)
+        VALUES ('delete', old.id, old.phone_number, old.location);
+        INSERT INTO call_logs_fts (rowid, phone_number, location)
+        VALUES (new.id, new.phone_number, new.location);
+    END
+    ''',
+)
+
+
+def month_of(call_date):
+    """从 "MM.DD" 日期中取出月份, 无法解析时返回None"""
+    try:
+        return int(str(call_date).split('.')[0])
+    except ValueError:
+        return None
+
+
+def duration_bucket(seconds) -> int:
+    """通话时长所在的区间 (见 DURATION_BUCKET_EDGES)"""
+    return bisect.bisect_right(DURATION_BUCKET_EDGES, int(seconds or 0))
+
+
+def rollup_keys(log: dict) -> tuple:
+    """记录在各汇总维度上的 (维度, 值), 与 ROLLUP_EXPRESSIONS 的计算方式一致"""
+    def column(name):
+        value = log.get(name, LOG_DEFAULTS.get(name))
+        return '' if value is None else str(value)
+    return (
+        ('direction', str(int(log.get('is_outgoing', LOG_DEFAULTS['is_outgoing']) or 0))),
+        ('phone', column('phone_number')),
+        ('location', column('location')),
+        ('duration', str(duration_bucket(log.get('call_duration')))),
+    )
+
+
+def call_timestamp(year, call_date, connect_time):
+    """由年份、"MM.DD" 日期和 "HH:MM[:SS]" 时间换算的 call_at 秒数, 无法解析时返回None"""
+    try:
+        month, day = (int(part) for part in str(call_date).split('.'))
+        hour, minute, *seconds = (int(part) for part in str(connect_time).split(':'))
+        moment = datetime(int(year), month, day, hour, minute, seconds[0] if seconds else 0)
+    except (TypeError, ValueError):
+        return None
+    return int((moment - CALL_AT_EPOCH).total_seconds())
+
+
+def period_range(year: int, month: int = None, day: str = None) -> tuple:
+    """某年/某月/某天 ("MM.DD") 对应的 call_at 范围 [起, 止)"""
+    if day is not None:
+        start = datetime(year, *(int(part) for part in day.split('.')))
+        end = start + timedelta(days=1)
+    elif month is not None:
+        start = datetime(year, month, 1)
+        end = datetime(year + month // 12, month % 12 + 1, 1)
+    else:
+        start, end = datetime(year, 1, 1), datetime(year + 1, 1, 1)
+    return int((start - CALL_AT_EPOCH).total_seconds()), int((end - CALL_AT_EPOCH).total_seconds())
+
+
+def prepare_log(data: dict) -> dict:
+    """写入前补齐记录的缺省年份和派生的 call_at"""
+    log = {'year': DEFAULT_YEAR, **data}
+    log['call_at'] = call_timestamp(log['year'], log.get('call_date'), log.get('connect_time'))
+    return log
+
+
+def collect_day_deltas(logs, sign: int, deltas: dict = None) -> dict:
+    """按 (年, "MM.DD") 汇总一批记录的增量: [通话次数, 费用]"""
+    deltas = {} if deltas is None else deltas
+    for log in logs:
+        totals = deltas.setdefault((log.get('year'), log.get('call_date')), [0, 0.0])
+        totals[0] += sign
+        totals[1] += sign * float(log.get('call_fee') or 0.0)
+    return deltas
+
+
+def log_sort_key(log: dict, order: str = DEFAULT_ORDER) -> tuple:
+    """记录在某种排序方式下的排序值 (与 SORT_ORDERS 的字段一致)"""
+    return tuple(log[column] for column in SORT_ORDERS[order][0])
+
+
+def collect_stats_deltas(logs, sign: int, deltas: dict = None) -> dict:
+    """按 (年, 月) 汇总一批记录的增量: [通话次数, 费用, 时长, 计费分钟数]"""
+    deltas = {} if deltas is None else deltas
+    for log in logs:
+        values = (
+            sign,
+            sign * float(log.get('call_fee') or 0.0),
+            sign * int(log.get('call_duration') or 0),
+            sign * int(log.get('billing_minutes') or 0),
+        )
+        keys = [ALL_MONTHS]
+        month = month_of(log.get('call_date'))
+        if month is not None:
+            keys.append((log.get('year'), month))
+        for key in keys:
+            totals = deltas.setdefault(key, [0, 0.0, 0, 0])
+            for index, value in enumerate(values):
+                totals[index] += value
+    return deltas
+
+
+def collect_rollup_deltas(logs, sign: int, deltas: dict = None) -> dict:
+    """按 (年, 月, 维度, 值) 汇总一批记录的增量: [通话次数, 费用, 时长]"""
+    deltas = {} if deltas is None else deltas
+    for log in logs:
+        month = month_of(log.get('call_date'))
+        if month is None:
+            continue
+        fee = sign * float(log.get('call_fee') or 0.0)
+        duration = sign * int(log.get('call_duration') or 0)
+        for dimension, value in rollup_keys(log):
+            totals = deltas.setdefault((log.get('year'), month, dimension, value), [0, 0.0, 0])
+            totals[0] += sign
+            totals[1] += fee
+            totals[2] += duration
+    return deltas
+
+
+def empty_changes(reload: bool = False) -> dict:
+    """空的变更通知: {'inserted': {id, ...}, 'updated': {id, ...}, 'deleted': {id, ...}, 'reload': 是否需要整体刷新}"""
+    return {'inserted': set(), 'updated': set(), 'deleted': set(), 'reload': reload}
+
+
+def merge_changes(changes: dict, other: dict) -> dict:
+    """把变更通知 other 合并到 changes 并返回 changes; 列出的id过多时改为整体刷新"""
+    if changes['reload']:
+        return changes
+    for kind in CHANGE_KINDS:
+        changes[kind] |= other[kind]
+    if other['reload'] or sum(len(changes[kind]) for kind in CHANGE_KINDS) > CHANGE_FEED_MAX_IDS:
+        changes.update(empty_changes(reload=True))
+    return changes
+
+
+def collect_changes(entries) -> dict:
+    """把事务中记录的 [(变更类型, ids), ...] 合并为一次变更通知"""
+    changes = empty_changes()
+    for kind, ids in entries:
+        other = empty_changes(reload=kind == 'reload')
+        if kind in CHANGE_KINDS:
+            other[kind].update(ids)
+        merge_changes(changes, other)
+    return changes
+
+
+class CallLogDatabase:
+    """通话记录数据库服务类"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        # 每个线程一个连接 (self.conn 返回当前线程的连接) 及该连接的事务状态
+        self.local = threading.local()
+        # 记录变更的订阅者 (每次提交后在写入的线程中调用)
+        self.subscribers = []
+        self.subscribers_lock = threading.Lock()
+        # WAL 模式: 读不阻塞写, 写也不阻塞读 (设置保存在数据库文件中)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.create_tables()
+        self.migrate()
+        self.backfill_call_at()
+        # SQLite 未编译 FTS5 时没有全文索引表, 搜索退回 LIKE 匹配
+        self.fts_enabled = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'call_logs_fts'"
+        ).fetchone() is not None
+
+    def connect(self) -> sqlite3.Connection:
+        """打开一个新连接 (每个线程各用一个)"""
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        # WAL 模式下 NORMAL 不会损坏数据库, 只是断电时可能丢失最后提交的事务
+        conn.execute("PRAGMA synchronous = NORMAL")
+        # 迁移回填 call_at 时在 SQL 中使用与写入时相同的换算
+        conn.create_function("call_timestamp", 3, call_timestamp, deterministic=True)
+        return conn
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """当前线程的连接 (首次使用时打开)"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self.connect()
+            # transaction() 的嵌套层数 (内层使用保存点) 和事务中的记录变更 [(变更类型, ids), ...] (提交后通知订阅者)
+            self.local.depth = 0
+            self.local.changes = []
+        return conn
+
+    def close(self):
+        """关闭当前线程的连接"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+    def create_tables(self):
+        """创建数据库表"""
+        with self.conn:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS call_logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    phone_number TEXT NOT NULL,
+                    call_type TEXT DEFAULT '高清语音',
+                    location TEXT DEFAULT '福建福州',
+                    connect_time TEXT NOT NULL,
+                    call_duration INTEGER DEFAULT 0,
+                    billing_minutes INTEGER DEFAULT 0,
+                    call_fee REAL DEFAULT 0.0,
+                    call_date TEXT NOT NULL,
+                    call_time TEXT NOT NULL,
+                    is_hd_voice INTEGER DEFAULT 1,
+                    is_outgoing INTEGER DEFAULT 1,
+                    weekday TEXT
+                )
+            ''')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS config (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+            ''')
+            # 插入默认配置
+            self.conn.execute(
+                "INSERT OR IGNORE INTO config (key, value) VALUES ('top_phone_number', '175****8164')"
+            )
+
+    def migrate(self):
+        """按 PRAGMA user_version 逐步升级数据库结构"""
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+
+        rebuild_stats = rebuild_day_stats = rebuild_rollups = False
+        # 整个升级在一个显式开启的写事务中 (sqlite3 不会在 DDL 前隐式 BEGIN, 加列/删索引会立即提交),
+        # 任何一步失败都回滚到原来的版本, 下次打开时重新升级
+        with self.transaction():
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < 2:
+                # v2: 增加年份字段及 (年, 日期) 索引, 用于按月查询
+                if 'year' not in self.call_log_columns():
+                    self.conn.execute("ALTER TABLE call_logs ADD COLUMN year INTEGER")
+                self.conn.execute("UPDATE call_logs SET year = ? WHERE year IS NULL", (DEFAULT_YEAR,))
+                self.conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_call_logs_year_date ON call_logs (year, call_date)"
+                )
+            if version < 3:
+                # v3: 按月及全部记录的汇总表, 随每次写入增量维护
+                self.conn.execute('''
+                    CREATE TABLE IF NOT EXISTS call_stats (
+                        year INTEGER NOT NULL,
+                        month INTEGER NOT NULL,
+                        call_count INTEGER NOT NULL DEFAULT 0,
+                        total_fee REAL NOT NULL DEFAULT 0.0,
+                        total_duration INTEGER NOT NULL DEFAULT 0,
+                        total_billing_minutes INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (year, month)
+                    )
+                ''')
+                rebuild_stats = True
+            if version < 4:
+                # v4: 号码/归属地的三元组全文索引 (外部内容表, 由触发器与 call_logs 保持同步)
+                self.create_search_index()
+            if version < 5:
+                # v5: 排序/筛选用的组合索引; (年, 日期, 时间) 索引覆盖了原来的 (年, 日期) 索引
+                self.conn.execute("DROP INDEX IF EXISTS idx_call_logs_year_date")
+                self.conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_call_logs_time ON call_logs (year, call_date, connect_time)"
+                )
+                self.conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_call_logs_direction_time "
+                    "ON call_logs (is_outgoing, year, call_date, connect_time)"
+                )
+                # 费用排序: 索引顺序与排序字段一致, 月份条件直接在索引中判断
+                self.conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_call_logs_fee ON call_logs (year, call_fee, call_date, connect_time)"
+                )
+            if version < 6:
+                # v6: 按日汇总表, 日历一次查询即可得到整月每天的通话次数和费用
+                self.conn.execute('''
+                    CREATE TABLE IF NOT EXISTS call_day_stats (
+                        year INTEGER NOT NULL,
+                        call_date TEXT NOT NULL,
+                        call_count INTEGER NOT NULL DEFAULT 0,
+                        total_fee REAL NOT NULL DEFAULT 0.0,
+                        PRIMARY KEY (year, call_date)
+                    ) WITHOUT ROWID
+                ''')
+                rebuild_day_stats = True
+            if version < 7:
+                # v7: 软删除. deleted_batch 为墓碑标记 (撤销日志的批次号, NULL 为未删除),
+                # 删除和清空只打标记, 可以撤销; 物理删除推迟到后台整理 (compact)
+                if 'deleted_batch' not in self.call_log_columns():
+                    self.conn.execute("ALTER TABLE call_logs ADD COLUMN deleted_batch INTEGER")
+                self.conn.execute('''
+                    CREATE TABLE IF NOT EXISTS undo_journal (
+                        batch INTEGER PRIMARY KEY AUTOINCREMENT,
+                        action TEXT NOT NULL,
+                        row_count INTEGER NOT NULL,
+                        created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                self.conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_call_logs_deleted ON call_logs (deleted_batch) "
+                    "WHERE deleted_batch IS NOT NULL"
+                )
+            if version < 8:
+                # v8: call_at 整数时间 (秒), 时间排序和按年/月/日筛选都在整数索引上比较, 不再比较日期/时间文本.
+                # 加列不改写表; 已有记录由 backfill_call_at() 分批回填, 回填完成后再建立新索引
+                if 'call_at' not in self.call_log_columns():
+                    self.conn.execute("ALTER TABLE call_logs ADD COLUMN call_at INTEGER")
+                for index in ('idx_call_logs_time', 'idx_call_logs_direction_time', 'idx_call_logs_fee'):
+                    self.conn.execute(f"DROP INDEX IF EXISTS {index}")
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO config (key, value) VALUES (?, '0')", (CALL_AT_BACKFILL_KEY,)
+                )
+            if version < 9:
+                # v9: 按月的多维汇总 (呼叫类型/号码/归属地/时长区间), 统计页只读取汇总, 随每次写入增量维护;
+                # 按通话次数的索引用于直接读出常用联系人, 不需要排序整月的号码
+                self.conn.execute('''
+                    CREATE TABLE IF NOT EXISTS call_rollups (
+                        year INTEGER NOT NULL,
+                        month INTEGER NOT NULL,
+                        dimension TEXT NOT NULL,
+                        value TEXT NOT NULL,
+                        call_count INTEGER NOT NULL DEFAULT 0,
+                        total_fee REAL NOT NULL DEFAULT 0.0,
+                        total_duration INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (year, month, dimension, value)
+                    ) WITHOUT ROWID
+                ''')
+                self.conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_call_rollups_count ON call_rollups (year, month, dimension, call_count)"
+                )
+                rebuild_rollups = True
+            if version < 10:
+                # v10: 汇总表不再计入 call_at 无效的记录 (与按月/按日的列表一致), 全部重建
+                rebuild_stats = rebuild_day_stats = rebuild_rollups = True
+            # 汇总表在结构全部升级后再重建 (重建时需要按墓碑标记过滤)
+            if rebuild_stats:
+                self.rebuild_stats()
+            if rebuild_day_stats:
+                self.rebuild_day_stats()
+            if rebuild_rollups:
+                self.rebuild_rollups()
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def call_log_columns(self) -> set:
+        """call_logs 表现有的列名"""
+        return {row['name'] for row in self.conn.execute("PRAGMA table_info(call_logs)")}
+
+    def backfill_call_at(self, batch_size: int = BULK_BATCH_SIZE):
+        """回填已有记录的 call_at 并建立时间索引 (v8 迁移)
+
+        按id分批, 每批一个短事务并记录进度, 不会长时间占用写锁, 中断后下次打开时从上次的位置继续。
+        """
+        progress = self.get_config(CALL_AT_BACKFILL_KEY)
+        if progress is None:
+            return
+        last_id = int(progress)
+        while True:
+            upper = self.conn.execute(
+                "SELECT MAX(id) FROM (SELECT id FROM call_logs WHERE id > ? ORDER BY id LIMIT ?)",
+                (last_id, batch_size)
+            ).fetchone()[0]
+            if upper is None:
+                break
+            with self.transaction():
+                self.conn.execute(
+                    "UPDATE call_logs SET call_at = call_timestamp(year, call_date, connect_time) "
+                    "WHERE id > ? AND id <= ?", (last_id, upper)
+                )
+                self.set_config(CALL_AT_BACKFILL_KEY, str(upper))
+            last_id = upper
+        with self.transaction():
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_call_logs_time ON call_logs (call_at)")
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_call_logs_direction_time ON call_logs (is_outgoing, call_at)"
+            )
+            # 费用排序: 年份等值后按 (费用, 时间) 索引顺序扫描
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_call_logs_fee ON call_logs (year, call_fee, call_at)")
+            # 汇总表只计入 call_at 有效的记录, 回填后按回填结果重建
+            self.rebuild_stats()
+            self.rebuild_day_stats()
+            self.rebuild_rollups()
+            self.conn.execute("DELETE FROM config WHERE key = ?", (CALL_AT_BACKFILL_KEY,))
+        invalid = self.conn.execute(
+            f"SELECT COUNT(*) FROM call_logs WHERE {LIVE_LOG_CONDITION} AND call_at IS NULL"
+        ).fetchone()[0]
+        if invalid:
+            logger.warning("%d 条记录的日期/时间无法解析, 不计入汇总, 也不会出现在按月/按日的列表中", invalid)
+
+    def create_search_index(self):
+        """创建号码/归属地全文索引及同步触发器, 并从现有记录重建索引"""
+        try:
+            self.conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS call_logs_fts USING fts5("
+                "phone_number, location, content='call_logs', content_rowid='id', tokenize='trigram')"
+            )
+        except sqlite3.OperationalError:
+            return  # 当前SQLite不支持FTS5或trigram分词器
+        # 逐条执行 (executescript 会先提交当前事务, 破坏迁移的原子性)
+        for trigger in SEARCH_INDEX_TRIGGERS:
+            self.conn.execute(trigger)
+        self.conn.execute("INSERT INTO call_logs_fts (call_logs_fts) VALUES ('rebuild')")
+
+    def get_all_logs(self) -> list:
+        """获取所有通话记录 (按id倒序)"""
+        rows = self.conn.execute(f"SELECT * FROM call_logs WHERE {LIVE_LOG_CONDITION} ORDER BY id DESC").fetchall()
+        return [dict(row) for row in rows]
+
+    def get_logs_page(self, after: dict = None, limit: int = PAGE_SIZE, year: int = None, month: int = None,
+                      query: str = None, order: str = DEFAULT_ORDER, is_outgoing: int = None,
+                      fee: str = None, day: str = None) -> list:
+        """分页获取通话记录 (键集分页, after 为上一页的最后一条记录)
+
+        year/month: 只查该月; day: 只查该年的某一天 ("MM.DD"); query: 按号码/归属地搜索;
+        order: SORT_ORDERS 中的排序方式; is_outgoing: 1 主叫 / 0 被叫; fee: FEE_FILTERS 中的费用筛选。
+        每一页都是一次带 LIMIT 的索引范围查询, 不会把整月记录读到内存中。
+        """
+        sql, params = self.build_logs_query(after, limit, year, month, query, order, is_outgoing, fee, day)
+        return [dict(row) for row in self.conn.execute(sql, params).fetchall()]
+
+    def build_logs_query(self, after: dict = None, limit: int = PAGE_SIZE, year: int = None, month: int = None,
+                         query: str = None, order: str = DEFAULT_ORDER, is_outgoing: int = None,
+                         fee: str = None, day: str = None):
+        """生成分页查询的 SQL 和参数, 各条件均有对应的组合索引"""
+        columns, descending = SORT_ORDERS[order]
+        source, conditions, params = "call_logs", [LIVE_LOG_CONDITION], []
+        if year is not None and order in ('fee_desc', 'fee_asc'):
+            # 没有统计信息时规划器倾向于取出整月再排序, 这里固定按 (年, 费用) 索引顺序扫描, 找够一页即停止
+            source = "call_logs INDEXED BY idx_call_logs_fee"
+        query = (query or "").strip()
+        if query and self.fts_enabled and len(query) >= FTS_MIN_QUERY_LENGTH:
+            # CROSS JOIN 固定先查全文索引, 再对 (通常很少的) 匹配结果排序
+            source = "call_logs_fts CROSS JOIN call_logs ON call_logs.id = call_logs_fts.rowid"
+            conditions.append("call_logs_fts MATCH ?")
+            params.append('"' + query.replace('"', '""') + '"')
+        elif query:
+            # 三元组索引至少需要3个字符, 更短的查询按排序索引顺序扫描, 找够一页即停止
+            pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            conditions.append("(call_logs.phone_number LIKE ? ESCAPE '\\' OR call_logs.location LIKE ? ESCAPE '\\')")
+            params += [pattern, pattern]
+        if year is not None:
+            # 某年/某月/某天: call_at 整数范围, 在时间索引上只读取范围内的记录
+            conditions.append("call_logs.call_at >= ? AND call_logs.call_at < ?")
+            params += period_range(year, month, day)
+            if order in ('fee_desc', 'fee_asc'):
+                # 费用索引以年份开头
+                conditions.append("call_logs.year = ?")
+                params.append(year)
+        if is_outgoing is not None:
+            conditions.append("call_logs.is_outgoing = ?")
+            params.append(int(is_outgoing))
+        if fee is not None:
+            conditions.append(FEE_FILTERS[fee])
+        if after is not None:
+            qualified = ", ".join(f"call_logs.{column}" for column in columns)
+            conditions.append(f"({qualified}) {'<' if descending else '>'} ({', '.join('?' * len(columns))})")
+            params += log_sort_key(after, order)
+
+        direction = "DESC" if descending else "ASC"
+        sql = f"SELECT call_logs.* FROM {source} WHERE {' AND '.join(conditions)}"
+        sql += f" ORDER BY {', '.join(f'call_logs.{column} {direction}' for column in columns)} LIMIT ?"
+        return sql, params + [limit]
+
+    def get_logs_by_month(self, year: int, month: int) -> list:
+        """获取某月的全部通话记录 (按时间倒序)"""
+        rows = self.conn.execute(
+            f"SELECT * FROM call_logs WHERE call_at >= ? AND call_at < ? AND {LIVE_LOG_CONDITION} "
+            "ORDER BY call_at DESC, id DESC",
+            period_range(year, month)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def subscribe(self, callback):
+        """订阅记录变更: 每次提交后在写入的线程中调用 callback(变更通知), 见 empty_changes"""
+        with self.subscribers_lock:
+            self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """取消订阅记录变更"""
+        with self.subscribers_lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+    def record_change(self, kind: str, ids=()):
+        """记录一次变更 (kind 为 CHANGE_KINDS 之一或 'reload'), 需在写事务内调用, 提交后通知订阅者"""
+        self.local.changes.append((kind, tuple(ids)))
+
+    def publish_changes(self, changes: dict):
+        """通知各订阅者 (某个订阅者出错不影响其他订阅者和写入)"""
+        with self.subscribers_lock:
+            subscribers = list(self.subscribers)
+        for callback in subscribers:
+            try:
+                callback(changes)
+            except Exception:
+                logger.exception("记录变更通知失败")
+
+    def get_log(self, log_id: int):
+        """按主键获取一条通话记录, 不存在或已删除时返回None"""
+        row = self.conn.execute(f"SELECT * FROM call_logs WHERE id = ? AND {LIVE_LOG_CONDITION}", (log_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_logs_by_ids(self, ids) -> list:
+        """按主键批量获取通话记录 (不存在或已删除的id不返回)"""
+        ids = list(ids)
+        if not ids:
+            return []
+        rows = self.conn.execute(
+            f"SELECT * FROM call_logs WHERE id IN ({', '.join('?' * len(ids))}) AND {LIVE_LOG_CONDITION}", ids
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def apply_stats(self, log: dict, sign: int):
+        """将一条记录计入(sign=1)或移出(sign=-1)所在月份、日期及全部记录的汇总, 需在写事务内调用"""
+        self.apply_stats_batch([log], sign)
+
+    def apply_stats_batch(self, logs: list, sign: int):
+        """将一批记录计入/移出月汇总、日汇总和多维汇总 (call_at 无效的记录不计入), 需在写事务内调用"""
+        logs = [log for log in logs if log.get('call_at') is not None]
+        self.write_stats_deltas(collect_stats_deltas(logs, sign))
+        self.write_day_stats_deltas(collect_day_deltas(logs, sign))
+        self.write_rollup_deltas(collect_rollup_deltas(logs, sign))
+
+    def write_rollup_deltas(self, deltas: dict):
+        """将 collect_rollup_deltas 汇总出的增量写入多维汇总表, 没有记录的维度值直接删除"""
+        self.conn.executemany('''
+            INSERT INTO call_rollups (year, month, dimension, value, call_count, total_fee, total_duration)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (year, month, dimension, value) DO UPDATE SET
+                call_count = call_count + excluded.call_count,
+                total_fee = total_fee + excluded.total_fee,
+                total_duration = total_duration + excluded.total_duration
+        ''', [key + tuple(values) for key, values in deltas.items()])
+        self.conn.executemany(
+            "DELETE FROM call_rollups WHERE year = ? AND month = ? AND dimension = ? AND value = ? AND call_count <= 0",
+            [key for key, values in deltas.items() if values[0] < 0]
+        )
+
+    def add_rollups_from(self, condition: str, params=()):
+        """把符合 condition 的记录在 SQL 中按各维度聚合后计入多维汇总 (撤销/重建时不把记录读到内存中), 需在写事务内调用"""
+        for dimension, expression in ROLLUP_EXPRESSIONS.items():
+            self.conn.execute(f'''
+                INSERT INTO call_rollups (year, month, dimension, value, call_count, total_fee, total_duration)
+                SELECT year, CAST(substr(call_date, 1, instr(call_date, '.') - 1) AS INTEGER), ?, {expression},
+                       COUNT(*), COALESCE(SUM(call_fee), 0.0), COALESCE(SUM(call_duration), 0)
+                FROM call_logs WHERE instr(call_date, '.') > 0 AND {condition}
+                GROUP BY 1, 2, 4
+                ON CONFLICT (year, month, dimension, value) DO UPDATE SET
+                    call_count = call_count + excluded.call_count,
+                    total_fee = total_fee + excluded.total_fee,
+                    total_duration = total_duration + excluded.total_duration
+            ''', (dimension, *params))
+
+    def write_day_stats_deltas(self, deltas: dict):
+        """将 collect_day_deltas 汇总出的增量写入日汇总表, 没有记录的日期直接删除"""
+        self.conn.executemany('''
+            INSERT INTO call_day_stats (year, call_date, call_count, total_fee) VALUES (?, ?, ?, ?)
+            ON CONFLICT (year, call_date) DO UPDATE SET
+                call_count = call_count + excluded.call_count,
+                total_fee = total_fee + excluded.total_fee
+        ''', [key + tuple(values) for key, values in deltas.items()])
+        self.conn.executemany(
+            "DELETE FROM call_day_stats WHERE year = ? AND call_date = ? AND call_count <= 0",
+            [key for key, values in deltas.items() if values[0] < 0]
+        )
+
+    def write_stats_deltas(self, deltas: dict):
+        """将 collect_stats_deltas 汇总出的增量写入汇总表, 需在写事务内调用"""
+        self.conn.executemany('''
+            INSERT INTO call_stats (year, month, call_count, total_fee, total_duration, total_billing_minutes)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (year, month) DO UPDATE SET
+                call_count = call_count + excluded.call_count,
+                total_fee = total_fee + excluded.total_fee,
+                total_duration = total_duration + excluded.total_duration,
+                total_billing_minutes = total_billing_minutes + excluded.total_billing_minutes
+        ''', [key + tuple(values) for key, values in deltas.items()])
+
+    def rebuild_stats(self):
+        """根据现有记录重新计算汇总表 (仅用于迁移/修复), 需在写事务内调用"""
+        self.conn.execute("DELETE FROM call_stats")
+        aggregates = '''
+            COUNT(*), COALESCE(SUM(call_fee), 0.0),
+            COALESCE(SUM(call_duration), 0), COALESCE(SUM(billing_minutes), 0)
+        '''
+        self.conn.execute(f'''
+            INSERT INTO call_stats (year, month, call_count, total_fee, total_duration, total_billing_minutes)
+            SELECT ?, ?, {aggregates} FROM call_logs WHERE {COUNTED_LOG_CONDITION}
+        ''', ALL_MONTHS)
+        self.conn.execute(f'''
+            INSERT INTO call_stats (year, month, call_count, total_fee, total_duration, total_billing_minutes)
+            SELECT year, CAST(substr(call_date, 1, instr(call_date, '.') - 1) AS INTEGER), {aggregates}
+            FROM call_logs WHERE instr(call_date, '.') > 0 AND {COUNTED_LOG_CONDITION}
+            GROUP BY 1, 2
+        ''')
+
+    def rebuild_day_stats(self):
+        """根据现有记录重新计算日汇总表 (仅用于迁移/修复), 需在写事务内调用"""
+        self.conn.execute("DELETE FROM call_day_stats")
+        self.conn.execute(f'''
+            INSERT INTO call_day_stats (year, call_date, call_count, total_fee)
+            SELECT year, call_date, COUNT(*), COALESCE(SUM(call_fee), 0.0)
+            FROM call_logs WHERE {COUNTED_LOG_CONDITION} GROUP BY year, call_date
+        ''')
+
+    def rebuild_rollups(self):
+        """根据现有记录重新计算多维汇总表 (仅用于迁移/修复), 需在写事务内调用"""
+        self.conn.execute("DELETE FROM call_rollups")
+        self.add_rollups_from(COUNTED_LOG_CONDITION)
+
+    def get_month_dashboard(self, year: int, month: int, top: int = STATS_TOP_COUNT) -> dict:
+        """统计页数据 (只读取汇总表): 月汇总、每天的通话、主叫/被叫、常用联系人、归属地费用和时长分布
+
+        direction: {1: 主叫汇总, 0: 被叫汇总}; top_contacts / locations: 按通话次数 / 费用倒序的前 top 项;
+        durations: 各时长区间 (见 DURATION_BUCKET_EDGES) 的通话次数。
+        """
+        def summary(row):
+            return {
+                'call_count': row['call_count'],
+                'total_fee': round(row['total_fee'], 2),
+                'total_duration': row['total_duration'],
+            }
+
+        rows = self.conn.execute(
+            "SELECT dimension, value, call_count, total_fee, total_duration FROM call_rollups "
+            "WHERE year = ? AND month = ? AND dimension IN ('direction', 'duration')",
+            (year, month)
+        ).fetchall()
+        direction = {1: None, 0: None}
+        durations = [0] * (len(DURATION_BUCKET_EDGES) + 1)
+        for row in rows:
+            if row['dimension'] == 'direction':
+                direction[int(row['value'])] = summary(row)
+            else:
+                durations[int(row['value'])] = row['call_count']
+        empty = {'call_count': 0, 'total_fee': 0.0, 'total_duration': 0}
+        # 按 (年, 月, 维度, 通话次数) 索引倒序读取, 读到 top 条即停止
+        top_contacts = self.conn.execute(
+            "SELECT value, call_count, total_fee, total_duration FROM call_rollups "
+            "WHERE year = ? AND month = ? AND dimension = 'phone' ORDER BY call_count DESC, value DESC LIMIT ?",
+            (year, month, top)
+        ).fetchall()
+        locations = self.conn.execute(
+            "SELECT value, call_count, total_fee, total_duration FROM call_rollups "
+            "WHERE year = ? AND month = ? AND dimension = 'location' ORDER BY total_fee DESC, call_count DESC LIMIT ?",
+            (year, month, top)
+        ).fetchall()
+        return {
+            'totals': self.get_stats(year, month),
+            'days': self.get_day_stats(year, month),
+            'direction': {key: value or empty for key, value in direction.items()},
+            'top_contacts': [{'phone_number': row['value'], **summary(row)} for row in top_contacts],
+            'locations': [{'location': row['value'], **summary(row)} for row in locations],
+            'durations': durations,
+        }
+
+    def get_day_stats(self, year: int, month: int) -> dict:
+        """获取某月每天的汇总: "MM.DD" -> {'call_count', 'total_fee'} (主键范围查询, 不扫描记录)"""
+        prefix = f"{month:02d}"
+        rows = self.conn.execute(
+            "SELECT call_date, call_count, total_fee FROM call_day_stats "
+            "WHERE year = ? AND call_date >= ? AND call_date < ?",
+            (year, f"{prefix}.", f"{prefix}/")
+        ).fetchall()
+        return {
+            row['call_date']: {'call_count': row['call_count'], 'total_fee': round(row['total_fee'], 2)}
+            for row in rows
+        }
+
+    def get_stats(self, year: int = None, month: int = None) -> dict:
+        """获取汇总数据 (费用总计/通话次数/总时长/计费分钟数); 不指定年月时为全部记录"""
+        key = ALL_MONTHS if year is None or month is None else (year, month)
+        row = self.conn.execute(
+            "SELECT call_count, total_fee, total_duration, total_billing_minutes FROM call_stats "
+            "WHERE year = ? AND month = ?", key
+        ).fetchone()
+        if row is None:
+            return {'call_count': 0, 'total_fee': 0.0, 'total_duration': 0, 'total_billing_minutes': 0}
+        stats = dict(row)
+        # 增量累加的浮点误差在分位上抹平
+        stats['total_fee'] = round(stats['total_fee'], 2)
+        return stats
+
+    def iter_logs(self, year: int = None, month: int = None, batch_size: int = ITER_BATCH_SIZE):
+        """逐批读取通话记录的迭代器 (用于导出, 不一次性加载全部记录)
+
+        使用独立的只读连接和读事务, 导出过程中看到的是一致的快照, 也不影响界面线程的连接。
+        指定 year/month 时按时间倒序返回该月记录 (走时间索引), 否则按id倒序返回全部记录。
+        """
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("BEGIN")
+            if year is not None and month is not None:
+                cursor = conn.execute(
+                    f"SELECT * FROM call_logs WHERE call_at >= ? AND call_at < ? AND {LIVE_LOG_CONDITION} "
+                    "ORDER BY call_at DESC, id DESC",
+                    period_range(year, month)
+                )
+            else:
+                cursor = conn.execute(f"SELECT * FROM call_logs WHERE {LIVE_LOG_CONDITION} ORDER BY id DESC")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+        finally:
+            conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """写事务 (可嵌套): 最外层提交或回滚, 内层使用保存点, 出错只回滚该层的修改"""
+        conn = self.conn
+        if self.local.depth == 0:
+            self.local.depth += 1
+            try:
+                with conn:
+                    # sqlite3 只在 DML 前隐式 BEGIN, 保存点不会; 显式开启事务,
+                    # 内层保存点才会嵌套在同一个事务里, 由这里统一提交
+                    conn.execute("BEGIN IMMEDIATE")
+                    yield
+            finally:
+                self.local.depth -= 1
+                changes, self.local.changes = self.local.changes, []
+            # 提交之后再通知订阅者 (回滚时没有变更)
+            if changes:
+                self.publish_changes(collect_changes(changes))
+            return
+        savepoint = f"sp{self.local.depth}"
+        conn.execute(f"SAVEPOINT {savepoint}")
+        self.local.depth += 1
+        recorded = len(self.local.changes)
+        try:
+            yield
+        except BaseException:
+            conn.execute(f"ROLLBACK TO {savepoint}")
+            del self.local.changes[recorded:]
+            raise
+        finally:
+            self.local.depth -= 1
+            conn.execute(f"RELEASE {savepoint}")
+
+    def has_logs(self) -> bool:
+        """是否存在通话记录"""
+        return self.conn.execute(f"SELECT 1 FROM call_logs WHERE {LIVE_LOG_CONDITION} LIMIT 1").fetchone() is not None
+
+    def add_call_log(self, data: dict) -> int:
+        """添加通话记录, 返回新记录id"""
+        data = prepare_log(data)
+        columns = [column for column in LOG_COLUMNS if column in data]
+        with self.transaction():
+            cursor = self.conn.execute(
+                f"INSERT INTO call_logs ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [data[column] for column in columns]
+            )
+            self.apply_stats(data, 1)
+            self.record_change('inserted', [cursor.lastrowid])
+        return cursor.lastrowid
+
+    def add_call_logs_bulk(self, logs, batch_size: int = BULK_BATCH_SIZE, progress=None) -> int:
+        """批量添加通话记录 (流式读取, 每 batch_size 条一个事务), 返回写入条数
+
+        progress(已写入条数) 在每个批次提交后回调。
+        """
+        total = 0
+        logs = iter(logs)
+        while True:
+            batch = [prepare_log(log) for log in itertools.islice(logs, batch_size)]
+            if not batch:
+                break
+            with self.transaction():
+                self.conn.executemany(
+                    f"INSERT INTO call_logs ({', '.join(LOG_COLUMNS)}) VALUES ({', '.join('?' * len(LOG_COLUMNS))})",
+                    [[log.get(column, LOG_DEFAULTS.get(column)) for column in LOG_COLUMNS] for log in batch]
+                )
+                self.apply_stats_batch(batch, 1)
+                self.record_change('reload')
+            total += len(batch)
+            if progress is not None:
+                progress(total)
+        return total
+
+    def update_call_log(self, log_id: int, data: dict) -> int:
+        """更新通话记录"""
+        columns = [column for column in LOG_COLUMNS if column in data]
+        if not columns:
+            return 0
+        with self.transaction():
+            old_log = self.get_log(log_id)
+            if old_log is None:
+                return 0
+            # 日期/时间变化时 call_at 随之重新计算
+            new_log = prepare_log({**old_log, **{column: data[column] for column in columns}})
+            if 'call_at' not in columns:
+                columns.append('call_at')
+            cursor = self.conn.execute(
+                f"UPDATE call_logs SET {', '.join(f'{column} = ?' for column in columns)} WHERE id = ?",
+                [new_log[column] for column in columns] + [log_id]
+            )
+            self.apply_stats(old_log, -1)
+            self.apply_stats(new_log, 1)
+            self.record_change('updated', [log_id])
+        return cursor.rowcount
+
+    def delete_call_log(self, log_id: int):
+        """删除通话记录 (软删除), 返回可用于 undo() 的批次号; 记录不存在时返回None"""
+        with self.transaction():
+            old_log = self.get_log(log_id)
+            if old_log is None:
+                return None
+            batch = self.add_undo_entry('delete', 1)
+            self.conn.execute("UPDATE call_logs SET deleted_batch = ? WHERE id = ?", (batch, log_id))
+            self.apply_stats(old_log, -1)
+            self.record_change('deleted', [log_id])
+        return batch
+
+    def clear_all_logs(self):
+        """清空所有通话记录 (软删除, 只打墓碑标记), 返回可用于 undo() 的批次号; 没有记录时返回None"""
+        with self.transaction():
+            count = self.conn.execute(f"SELECT COUNT(*) FROM call_logs WHERE {LIVE_LOG_CONDITION}").fetchone()[0]
+            if not count:
+                return None
+            batch = self.add_undo_entry('clear', count)
+            self.conn.execute(f"UPDATE call_logs SET deleted_batch = ? WHERE {LIVE_LOG_CONDITION}", (batch,))
+            self.conn.execute("DELETE FROM call_stats")
+            self.conn.execute("DELETE FROM call_day_stats")
+            self.conn.execute("DELETE FROM call_rollups")
+            self.record_change('reload')
+        return batch
+
+    def add_undo_entry(self, action: str, row_count: int) -> int:
+        """写入一条撤销日志并返回批次号, 超出 UNDO_JOURNAL_SIZE 或 UNDO_WINDOW 的旧批次不再可撤销, 需在写事务内调用"""
+        batch = self.conn.execute(
+            "INSERT INTO undo_journal (action, row_count) VALUES (?, ?)", (action, row_count)
+        ).lastrowid
+        self.conn.execute("DELETE FROM undo_journal WHERE batch <= ?", (batch - UNDO_JOURNAL_SIZE,))
+        return batch
+
+    def undo(self, batch: int) -> int:
+        """撤销一次删除/清空, 返回恢复的记录条数 (批次已过期或已撤销时返回0)"""
+        with self.transaction():
+            if self.conn.execute(
+                f"SELECT 1 FROM undo_journal WHERE batch = ? AND NOT {UNDO_EXPIRED_CONDITION}", (batch,)
+            ).fetchone() is None:
+                return 0
+            restored = self.conn.execute(
+                "SELECT COUNT(*) FROM call_logs WHERE deleted_batch = ?", (batch,)
+            ).fetchone()[0]
+            # 按天聚合后计入汇总表 (撤销清空时不必把全部记录读到内存中), call_at 无效的记录不计入
+            groups = self.conn.execute('''
+                SELECT year, call_date, COUNT(*), COALESCE(SUM(call_fee), 0.0),
+                       COALESCE(SUM(call_duration), 0), COALESCE(SUM(billing_minutes), 0)
+                FROM call_logs WHERE deleted_batch = ? AND call_at IS NOT NULL GROUP BY year, call_date
+            ''', (batch,)).fetchall()
+            if restored <= CHANGE_FEED_MAX_IDS:
+                restored_ids = self.conn.execute("SELECT id FROM call_logs WHERE deleted_batch = ?", (batch,))
+                self.record_change('inserted', [row[0] for row in restored_ids])
+            else:
+                self.record_change('reload')
+            self.add_rollups_from("deleted_batch = ? AND call_at IS NOT NULL", (batch,))
+            self.conn.execute("UPDATE call_logs SET deleted_batch = NULL WHERE deleted_batch = ?", (batch,))
+            self.conn.execute("DELETE FROM undo_journal WHERE batch = ?", (batch,))
+            stats_deltas, day_deltas = {}, {}
+            for year, call_date, *values in groups:
+                day_deltas[(year, call_date)] = values[:2]
+                keys = [ALL_MONTHS]
+                if month_of(call_date) is not None:
+                    keys.append((year, month_of(call_date)))
+                for key in keys:
+                    totals = stats_deltas.setdefault(key, [0, 0.0, 0, 0])
+                    for index, value in enumerate(values):
+                        totals[index] += value
+            self.write_stats_deltas(stats_deltas)
+            self.write_day_stats_deltas(day_deltas)
+        return restored
+
+    def compact(self) -> int:
+        """后台整理: 物理删除已不可撤销的记录, 空闲页较多时执行 VACUUM, 返回删除的记录条数"""
+        with self.transaction():
+            # 超过撤销时长的批次先移出撤销日志, 否则要再删除 UNDO_JOURNAL_SIZE 次才会被整理,
+            # 期间墓碑记录一直留在时间/费用索引中, 拖慢每一次列表查询
+            self.conn.execute(f"DELETE FROM undo_journal WHERE {UNDO_EXPIRED_CONDITION}")
+            purged = self.conn.execute(
+                "DELETE FROM call_logs WHERE deleted_batch IS NOT NULL "
+                "AND deleted_batch NOT IN (SELECT batch FROM undo_journal)"
+            ).rowcount
+        if purged:
+            page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+            free_pages = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if page_count and free_pages / page_count > VACUUM_FREE_RATIO:
+                try:
+                    self.conn.execute("VACUUM")
+                except sqlite3.OperationalError:
+                    pass  # 有导出等其他连接正在读取, 下次整理时再压缩
+        return purged
+
+    def get_total_fee(self) -> float:
+        """获取通话费用总计 (读取汇总表, 不扫描记录)"""
+        return self.get_stats()['total_fee']
+
+    def get_config(self, key: str, default: str = None) -> str:
+        """获取配置项"""
+        row = self.conn.execute("SELECT value FROM config WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else default
+
+    def set_config(self, key: str, value: str):
+        """设置配置项"""
+        with self.transaction():
+            self.conn.execute(
+                "INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)", (key, value)
+            )
+
+    def init_sample_data(self):
+        """初始化示例数据"""
+        if self.has_logs():
+            return  # 已有数据，不重复初始化
+
+        self.add_call_log({
+            'phone_number': '059138167112',
+            'location': '福建福州',
+            'connect_time': '16:43',
+            'call_duration': 5,
+            'billing_minutes': 1,
+            'call_fee': 0.00,
+            'call_date': '12.02',
+            'call_time': '16:43',
+            'is_outgoing': 1,
+            'weekday': '星期二',
+        })
+        self.add_call_log({
+            'phone_number': '17673619243',
+            'location': '湖南长沙',
+            'connect_time': '14:30',
+            'call_duration': 125,
+            'billing_minutes': 3,
+            'call_fee': 0.00,
+            'call_date': '12.01',
+            'call_time': '14:30',
+            'is_outgoing': 0,
+            'weekday': '星期一',
+        })
+
+
+def set_future_result(future: asyncio.Future, result, error):
+    """在事件循环中设置 Future 的结果 (等待方已取消时忽略)"""
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class DatabaseWorker:
+    """数据库后台线程: 读操作在读线程池中并发执行, 写操作在唯一的写线程中按提交顺序执行, 界面事件处理中 await 结果
+
+    每个线程使用自己的连接, WAL 模式下读连接之间、读和写之间都不互相阻塞;
+    只有一个写线程, 写事务不会争抢写锁 (不会出现 "database is locked")。
+    write() 提交的写操作先排队, 写线程空闲后把排队的全部写操作放在一个事务中执行,
+    连续的多次写入只提交一次。同一进程中的多个会话共用一个 (见 shared_database)。
+    """
+
+    def __init__(self, db: CallLogDatabase, readers: int = READER_THREADS):
+        self.db = db
+        self.reader = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="call-log-db-read")
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="call-log-db-write")
+        # 等待执行的写操作: [(函数, Future, 事件循环), ...]
+        self.pending_writes = []
+        self.lock = threading.Lock()
+
+    async def call(self, func, *args, **kwargs):
+        """在读线程中执行只读操作 func(*args, **kwargs) 并返回结果"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.reader, functools.partial(func, *args, **kwargs))
+
+    async def write(self, func, *args, **kwargs):
+        """在写线程中执行写操作并返回结果, 与前后紧接着提交的写操作合并为一个事务"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self.lock:
+            self.pending_writes.append((functools.partial(func, *args, **kwargs), future, loop))
+            schedule = len(self.pending_writes) == 1
+        if schedule:
+            self.writer.submit(self.run_pending_writes)
+        return await future
+
+    async def write_alone(self, func, *args, **kwargs):
+        """在写线程中单独执行自行管理事务的写操作 (批量导入、后台整理等), 不与其他写操作合并"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.writer, functools.partial(func, *args, **kwargs))
+
+    def run_pending_writes(self):
+        """在一个事务中依次执行排队的写操作 (每个写操作一个保存点, 出错只回滚它自己)"""
+        with self.lock:
+            writes, self.pending_writes = self.pending_writes, []
+        results = []
+        try:
+            with self.db.transaction():
+                for write, future, loop in writes:
+                    try:
+                        with self.db.transaction():
+                            results.append((future, loop, write(), None))
+                    except Exception as error:
+                        results.append((future, loop, None, error))
+        except Exception as error:
+            # 开启或提交事务失败: 整批写入都已回滚, 每个写操作都收到这个错误
+            results = [(future, loop, None, error) for _, future, loop in writes]
+        for future, loop, result, error in results:
+            loop.call_soon_threadsafe(set_future_result, future, result, error)
+
+    def close(self):
+        """等待已提交的操作完成后关闭读写线程"""
+        self.reader.shutdown(wait=True)
+        self.writer.shutdown(wait=True)
+
+
+# 进程内共享的数据库: 文件路径 -> (CallLogDatabase, DatabaseWorker)
+shared_databases = {}
+shared_databases_lock = threading.Lock()
+
+
+def shared_database(db_path: str = DEFAULT_DB_PATH, setup=None) -> tuple:
+    """获取进程内共享的数据库和后台线程, 返回 (CallLogDatabase, DatabaseWorker)
+
+    Flet 以 Web 服务运行时每个会话都会调用, 同一文件只在第一次调用时打开数据库、执行迁移和 setup(db)。
+    """
+    with shared_databases_lock:
+        shared = shared_databases.get(db_path)
+        if shared is None:
+            db = CallLogDatabase(db_path)
+            if setup is not None:
+                setup(db)
+            shared = shared_databases[db_path] = (db, DatabaseWorker(db))
+    return shared
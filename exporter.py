@@ -0,0 +1,215 @@
+"""
+通话详单查看器 - 详单导出
+从数据库游标逐条读取记录并直接写入磁盘 (CSV / JSON Lines / PDF), 内存占用与记录条数无关
+"""
+import csv
+import json
+import os
+import zlib
+
+
+# 导出字段: (数据库字段, 表头)
+EXPORT_FIELDS = (
+    ('year', '年份'),
+    ('call_date', '日期'),
+    ('connect_time', '接通时间'),
+    ('phone_number', '对方号码'),
+    ('location', '对方号码归属地'),
+    ('call_type', '通话类型'),
+    ('is_outgoing', '呼叫类型'),
+    ('call_duration', '通话时长(秒)'),
+    ('billing_minutes', '计费分钟数'),
+    ('call_fee', '通话费用'),
+)
+
+# 支持的导出格式 -> 文件扩展名
+EXPORT_FORMATS = {
+    'csv': 'csv',
+    'jsonl': 'jsonl',
+    'pdf': 'pdf',
+}
+
+# 每写入多少条回调一次进度
+PROGRESS_INTERVAL = 1000
+
+
+def format_export_value(field: str, value):
+    """导出时的字段格式化"""
+    if field == 'is_outgoing':
+        return "主叫" if value else "被叫"
+    if field == 'call_fee':
+        return f"{value or 0:.2f}"
+    return "" if value is None else value
+
+
+def write_csv(logs, f, progress=None) -> int:
+    """写出CSV (带BOM, Excel可直接打开)"""
+    writer = csv.writer(f)
+    writer.writerow([title for _, title in EXPORT_FIELDS])
+    count = 0
+    for log in logs:
+        writer.writerow([format_export_value(field, log.get(field)) for field, _ in EXPORT_FIELDS])
+        count += 1
+        if progress is not None and count % PROGRESS_INTERVAL == 0:
+            progress(count)
+    return count
+
+
+def write_jsonl(logs, f, progress=None) -> int:
+    """写出JSON Lines, 每行一条记录"""
+    count = 0
+    for log in logs:
+        record = {field: log.get(field) for field, _ in EXPORT_FIELDS}
+        f.write(json.dumps(record, ensure_ascii=False))
+        f.write("\n")
+        count += 1
+        if progress is not None and count % PROGRESS_INTERVAL == 0:
+            progress(count)
+    return count
+
+
+class StreamingPdfWriter:
+    """极简的流式PDF写入器: 每页写完立即落盘, 只在内存中保留各对象的偏移量
+
+    使用 Adobe 标准中文字体 STSong-Light (UniGB-UCS2-H 编码), 不需要嵌入字体文件。
+    """
+
+    PAGE_WIDTH = 595   # A4, 单位pt
+    PAGE_HEIGHT = 842
+    FONT_SIZE = 8
+    LINE_HEIGHT = 15
+    MARGIN = 36
+
+    # 固定对象编号: 1 目录, 2 页面树 (最后写入), 3-5 字体
+    CATALOG_ID, PAGES_ID, FONT_ID = 1, 2, 3
+
+    def __init__(self, f):
+        self.f = f
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = 6
+        self.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self.write_object(self.CATALOG_ID, b"<< /Type /Catalog /Pages 2 0 R >>")
+        self.write_object(self.FONT_ID, (
+            b"<< /Type /Font /Subtype /Type0 /BaseFont /STSong-Light /Encoding /UniGB-UCS2-H "
+            b"/DescendantFonts [4 0 R] >>"
+        ))
+        self.write_object(4, (
+            b"<< /Type /Font /Subtype /CIDFontType0 /BaseFont /STSong-Light "
+            b"/CIDSystemInfo << /Registry (Adobe) /Ordering (GB1) /Supplement 2 >> "
+            b"/FontDescriptor 5 0 R /DW 1000 /W [1 95 500] >>"
+        ))
+        self.write_object(5, (
+            b"<< /Type /FontDescriptor /FontName /STSong-Light /Flags 6 /FontBBox [-25 -254 1000 880] "
+            b"/ItalicAngle 0 /Ascent 880 /Descent -120 /CapHeight 880 /StemV 93 >>"
+        ))
+
+    def write(self, data: bytes):
+        self.f.write(data)
+
+    def write_object(self, object_id: int, body: bytes):
+        self.offsets[object_id] = self.f.tell()
+        self.write(b"%d 0 obj\n" % object_id + body + b"\nendobj\n")
+
+    def allocate_id(self) -> int:
+        object_id = self.next_id
+        self.next_id += 1
+        return object_id
+
+    @staticmethod
+    def encode_text(text: str) -> bytes:
+        """文本编码为 UCS-2 十六进制字符串 (超出BMP的字符用?代替)"""
+        text = "".join(ch if ord(ch) <= 0xFFFF else "?" for ch in str(text))
+        return b"<" + text.encode('utf-16-be').hex().encode('ascii') + b">"
+
+    def add_page(self, lines):
+        """写入一页: lines 为 [(x, y, 文本), ...]"""
+        commands = [b"BT /F1 %d Tf" % self.FONT_SIZE]
+        for x, y, text in lines:
+            commands.append(b"1 0 0 1 %.1f %.1f Tm %s Tj" % (x, y, self.encode_text(text)))
+        commands.append(b"ET")
+        stream = zlib.compress(b"\n".join(commands))
+
+        content_id = self.allocate_id()
+        self.write_object(content_id, (
+            b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        ))
+        page_id = self.allocate_id()
+        self.write_object(page_id, (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] " % (self.PAGE_WIDTH, self.PAGE_HEIGHT)
+            + b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        ))
+        self.page_ids.append(page_id)
+
+    def close(self):
+        """写入页面树、交叉引用表和文件尾"""
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self.page_ids)
+        self.write_object(self.PAGES_ID, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.page_ids)))
+        xref_offset = self.f.tell()
+        self.write(b"xref\n0 %d\n0000000000 65535 f \n" % self.next_id)
+        for object_id in range(1, self.next_id):
+            self.write(b"%010d 00000 n \n" % self.offsets[object_id])
+        self.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (self.next_id, xref_offset))
+
+
+# PDF每列的横坐标 (pt)
+PDF_COLUMN_X = (36, 70, 105, 150, 225, 305, 360, 400, 455, 510)
+
+
+def write_pdf(logs, f, title: str = "通话详单", progress=None) -> int:
+    """写出分页的PDF详单"""
+    pdf = StreamingPdfWriter(f)
+    top = pdf.PAGE_HEIGHT - pdf.MARGIN
+    rows_per_page = int((top - pdf.MARGIN) // pdf.LINE_HEIGHT) - 2  # 减去标题和表头两行
+    header = [(x, top - pdf.LINE_HEIGHT, name) for x, (_, name) in zip(PDF_COLUMN_X, EXPORT_FIELDS)]
+
+    count = 0
+    page_no = 0
+    lines = None
+    for log in logs:
+        if lines is None:
+            page_no += 1
+            lines = [(pdf.MARGIN, top, f"{title}    第 {page_no} 页")] + header
+        y = top - pdf.LINE_HEIGHT * (2 + (count % rows_per_page))
+        lines.extend(
+            (x, y, format_export_value(field, log.get(field)))
+            for x, (field, _) in zip(PDF_COLUMN_X, EXPORT_FIELDS)
+        )
+        count += 1
+        if count % rows_per_page == 0:
+            pdf.add_page(lines)
+            lines = None
+        if progress is not None and count % PROGRESS_INTERVAL == 0:
+            progress(count)
+
+    if lines is not None or count == 0:
+        pdf.add_page(lines or [(pdf.MARGIN, top, f"{title}    没有记录")])
+    pdf.close()
+    return count
+
+
+def export_logs(db, path: str, fmt: str, year: int = None, month: int = None,
+                title: str = "通话详单", progress=None) -> int:
+    """导出通话记录到文件, 返回导出条数
+
+    先写入临时文件, 完成后再替换目标文件, 导出中途失败不会留下残缺的文件。
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+    logs = db.iter_logs(year=year, month=month)
+    temp_path = f"{path}.part"
+    try:
+        if fmt == 'pdf':
+            with open(temp_path, 'wb') as f:
+                count = write_pdf(logs, f, title=title, progress=progress)
+        else:
+            encoding = 'utf-8-sig' if fmt == 'csv' else 'utf-8'
+            with open(temp_path, 'w', newline='', encoding=encoding) as f:
+                writer = write_csv if fmt == 'csv' else write_jsonl
+                count = writer(logs, f, progress=progress)
+        os.replace(temp_path, path)
+    finally:
+        logs.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return count
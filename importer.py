@@ -0,0 +1,216 @@
+"""
+通话详单查看器 - 详单导入
+流式解析运营商导出的 CSV/XLSX 通话详单, 校验后批量写入数据库
+"""
+import codecs
+import csv
+import os
+import re
+from datetime import datetime
+
+from database import DEFAULT_YEAR, BULK_BATCH_SIZE
+
+
+# 详单表头 -> 数据库字段 (同时接受数据库字段名本身)
+HEADER_ALIASES = {
+    'phone_number': ('对方号码', '通话号码', '号码'),
+    'call_type': ('通话类型', '业务类型'),
+    'location': ('对方号码归属地', '归属地', '通话地点'),
+    'call_date': ('日期', '通话日期', '起始日期'),
+    'connect_time': ('接通时间', '起始时间', '开始时间'),
+    'call_duration': ('通话时长', '时长'),
+    'billing_minutes': ('计费分钟数', '计费时长'),
+    'call_fee': ('通话费用', '费用', '话费'),
+    'is_outgoing': ('呼叫类型', '主被叫'),
+}
+
+# 单条记录校验失败时最多保留的错误信息条数
+MAX_ERRORS = 100
+
+# 检测 CSV 编码时每次读取的字节数
+ENCODING_CHUNK_SIZE = 1 << 16
+
+DURATION_PATTERN = re.compile(r'^(?:(\d+)小时)?(?:(\d+)分(?:钟)?)?(?:(\d+)秒)?$')
+
+
+class BillImportError(ValueError):
+    """详单某一行的数据无效"""
+
+
+class ImportResult:
+    """导入结果统计"""
+
+    def __init__(self):
+        self.imported = 0
+        self.skipped = 0
+        self.errors = []  # (行号, 错误信息), 最多 MAX_ERRORS 条
+
+    def add_error(self, line_no: int, message: str):
+        self.skipped += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line_no, message))
+
+
+def build_header_map(header) -> dict:
+    """根据表头生成 列序号 -> 数据库字段 的映射"""
+    lookup = {}
+    for field, aliases in HEADER_ALIASES.items():
+        lookup[field] = field
+        for alias in aliases:
+            lookup[alias] = field
+    return {
+        index: lookup[str(name).strip()]
+        for index, name in enumerate(header)
+        if name is not None and str(name).strip() in lookup
+    }
+
+
+def detect_csv_encoding(path: str) -> str:
+    """CSV 文件的编码: 整个文件都能按 UTF-8 解码时为 utf-8-sig (兼容Excel另存的带BOM文件), 否则为 gb18030
+
+    运营商导出的详单常用 GBK/GB18030 编码; 分块增量解码, 内存占用与文件大小无关。
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    with open(path, 'rb') as f:
+        try:
+            for chunk in iter(lambda: f.read(ENCODING_CHUNK_SIZE), b''):
+                decoder.decode(chunk)
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            return 'gb18030'
+    return 'utf-8-sig'
+
+
+def iter_raw_rows(path: str):
+    """逐行读取 CSV/XLSX 文件, 第一行为表头, 返回 (行号, 原始行) 迭代器"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        with open(path, newline='', encoding=detect_csv_encoding(path)) as f:
+            yield from enumerate(csv.reader(f), start=1)
+    elif extension == '.xlsx':
+        try:
+            import openpyxl
+        except ImportError as exc:
+            raise RuntimeError("导入 xlsx 详单需要安装 openpyxl") from exc
+        # 只读模式按行流式读取，内存占用与文件大小无关
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            yield from enumerate(workbook.active.iter_rows(values_only=True), start=1)
+        finally:
+            workbook.close()
+    else:
+        raise ValueError(f"不支持的详单格式: {extension}")
+
+
+def parse_call_date(value, default_year: int):
+    """解析日期, 支持 MM.DD / YYYY.MM.DD / YYYY-MM-DD / YYYY/MM/DD, 返回 (年, "MM.DD")
+
+    XLSX 中 MM.DD 形式的日期可能被存为数字 (12.10 读出来是 12.1), 按两位小数补回日期的末尾0。
+    """
+    if isinstance(value, datetime):
+        return value.year, value.strftime("%m.%d")
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = f"{value:.2f}"
+    text = str(value).strip().replace('-', '.').replace('/', '.')
+    try:
+        parsed = datetime.strptime(text, "%Y.%m.%d")
+    except ValueError:
+        try:
+            parsed = datetime.strptime(f"{default_year}.{text}", "%Y.%m.%d")
+        except ValueError:
+            raise BillImportError(f"日期格式应为 MM.DD: {value!r}") from None
+    return parsed.year, parsed.strftime("%m.%d")
+
+
+def parse_connect_time(value) -> str:
+    """解析接通时间为 HH:MM"""
+    if isinstance(value, datetime):
+        return value.strftime("%H:%M")
+    text = str(value).strip()
+    for fmt in ("%H:%M", "%H:%M:%S"):
+        try:
+            return datetime.strptime(text, fmt).strftime("%H:%M")
+        except ValueError:
+            continue
+    raise BillImportError(f"接通时间格式应为 HH:MM: {value!r}")
+
+
+def parse_duration(value) -> int:
+    """解析通话时长为秒数, 支持纯数字秒数和 "X分Y秒" 写法"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip()
+    if text.isdigit():
+        return int(text)
+    match = DURATION_PATTERN.match(text)
+    if not text or not match:
+        raise BillImportError(f"无效的通话时长: {value!r}")
+    hours, minutes, seconds = (int(group or 0) for group in match.groups())
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def parse_bill_row(fields: dict, default_year: int) -> dict:
+    """校验一行详单并转换为数据库记录"""
+    for required in ('phone_number', 'call_date', 'connect_time'):
+        if fields.get(required) in (None, ''):
+            raise BillImportError(f"缺少字段 {required}")
+
+    year, call_date = parse_call_date(fields['call_date'], default_year)
+    connect_time = parse_connect_time(fields['connect_time'])
+    duration = parse_duration(fields.get('call_duration') or 0)
+    try:
+        billing = int(float(fields.get('billing_minutes') or (duration + 59) // 60))
+        fee = float(str(fields.get('call_fee') or 0).lstrip('¥').replace('元', ''))
+    except ValueError as exc:
+        raise BillImportError(f"无效的数值: {exc}") from exc
+    if duration < 0 or billing < 0 or fee < 0:
+        raise BillImportError("时长/计费分钟数/费用不能为负数")
+
+    log = {
+        'phone_number': str(fields['phone_number']).strip(),
+        'connect_time': connect_time,
+        'call_duration': duration,
+        'billing_minutes': billing,
+        'call_fee': fee,
+        'call_date': call_date,
+        'call_time': connect_time,
+        'year': year,
+    }
+    if fields.get('call_type'):
+        log['call_type'] = str(fields['call_type']).strip()
+    if fields.get('location'):
+        log['location'] = str(fields['location']).strip()
+    if fields.get('is_outgoing') not in (None, ''):
+        direction = str(fields['is_outgoing']).strip()
+        log['is_outgoing'] = 0 if direction in ('被叫', '0', 'false', 'False') else 1
+    return log
+
+
+def iter_bill_logs(path: str, result: ImportResult, default_year: int = DEFAULT_YEAR):
+    """流式读取并校验详单, 跳过无效行并记录到 result"""
+    header_map = None
+    for line_no, raw in iter_raw_rows(path):
+        if not raw or all(cell in (None, '') for cell in raw):
+            continue
+        if header_map is None:
+            header_map = build_header_map(raw)
+            if 'phone_number' not in header_map.values():
+                raise ValueError("详单表头中未找到对方号码列")
+            continue
+        fields = {field: raw[index] for index, field in header_map.items() if index < len(raw)}
+        try:
+            yield parse_bill_row(fields, default_year)
+        except BillImportError as exc:
+            result.add_error(line_no, str(exc))
+
+
+def import_bill(db, path: str, default_year: int = DEFAULT_YEAR, progress=None,
+                batch_size: int = BULK_BATCH_SIZE) -> ImportResult:
+    """导入详单文件, progress(已导入条数) 在每个批次提交后回调"""
+    result = ImportResult()
+    result.imported = db.add_call_logs_bulk(
+        iter_bill_logs(path, result, default_year),
+        batch_size=batch_size,
+        progress=progress
+    )
+    return result
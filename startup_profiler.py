@@ -0,0 +1,147 @@
+"""
+通话详单查看器 - 启动性能分析
+设置环境变量 CALL_LOG_PROFILE 后记录启动各阶段耗时 (模块导入、数据库、构建界面、首次刷新),
+写出 Chrome Trace 格式的 JSON (可用 chrome://tracing 或 Perfetto 打开) 并输出汇总
+
+    CALL_LOG_PROFILE=1                    写入 startup_trace.json
+    CALL_LOG_PROFILE=trace/start.json     写入指定路径
+    CALL_LOG_STARTUP_BUDGET_MS=800        首屏耗时超过预算时输出警告
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+logger = logging.getLogger("call_log.startup")
+
+# 开启分析的环境变量 (值为 1 时使用默认输出路径)
+PROFILE_ENV = "CALL_LOG_PROFILE"
+# 首屏耗时预算 (毫秒) 的环境变量
+BUDGET_ENV = "CALL_LOG_STARTUP_BUDGET_MS"
+DEFAULT_TRACE_PATH = "startup_trace.json"
+
+
+class StartupProfiler:
+    """启动阶段计时器, 未开启时所有方法都是空操作"""
+
+    def __init__(self, trace_path: str = None, budget_ms: float = None):
+        self.enabled = trace_path is not None
+        self.trace_path = trace_path
+        self.budget_ms = budget_ms
+        # 以本模块被导入的时刻作为启动起点
+        self.origin = time.perf_counter()
+        self.events = []
+        # 标记名 -> 距启动起点的毫秒数
+        self.marks = {}
+        # 类别 -> 上一次 lap() 的时刻, 用于连续阶段计时
+        self.lap_starts = {}
+        self.finished = False
+
+    def elapsed_ms(self) -> float:
+        """距启动起点的毫秒数"""
+        return (time.perf_counter() - self.origin) * 1000
+
+    @contextmanager
+    def phase(self, name: str, category: str = "startup"):
+        """记录一个阶段的起止时间 (可在多个线程中同时使用)"""
+        if not self.enabled:
+            yield
+            return
+        started = self.elapsed_ms()
+        try:
+            yield
+        finally:
+            self.add_phase(name, category, started)
+
+    def start_laps(self, category: str):
+        """开始连续阶段计时, 之后每次 lap() 记录从上一次到现在的一个阶段"""
+        if self.enabled:
+            self.lap_starts[category] = self.elapsed_ms()
+
+    def lap(self, category: str, name: str):
+        """结束当前连续阶段并开始下一个"""
+        if not self.enabled or category not in self.lap_starts:
+            return
+        self.add_phase(name, category, self.lap_starts[category])
+        self.lap_starts[category] = self.elapsed_ms()
+
+    def add_phase(self, name: str, category: str, started: float):
+        """记录一个从 started (毫秒) 到现在的阶段"""
+        self.events.append({
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': round(started * 1000),
+            'dur': round((self.elapsed_ms() - started) * 1000),
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+        })
+
+    def mark(self, name: str):
+        """记录一个时间点 (同名标记只记录第一次)"""
+        if not self.enabled or name in self.marks:
+            return
+        self.marks[name] = self.elapsed_ms()
+        self.events.append({
+            'name': name,
+            'cat': 'mark',
+            'ph': 'i',
+            's': 'g',
+            'ts': round(self.marks[name] * 1000),
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+        })
+
+    def summary(self) -> dict:
+        """按类别汇总各阶段耗时 (毫秒)"""
+        phases = {}
+        for event in self.events:
+            if event['ph'] == 'X':
+                category = phases.setdefault(event['cat'], {})
+                category[event['name']] = round(category.get(event['name'], 0) + event['dur'] / 1000, 2)
+        summary = {
+            'phases': phases,
+            'marks': {name: round(value, 2) for name, value in self.marks.items()},
+            'total_ms': round(self.elapsed_ms(), 2),
+        }
+        if self.budget_ms is not None:
+            first_update = self.marks.get('first_update')
+            summary['budget_ms'] = self.budget_ms
+            summary['over_budget'] = first_update is not None and first_update > self.budget_ms
+        return summary
+
+    def finish(self):
+        """写出 JSON 追踪文件并输出汇总 (只执行一次)"""
+        if not self.enabled or self.finished:
+            return
+        self.finished = True
+        summary = self.summary()
+        with open(self.trace_path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': self.events, 'summary': summary}, f, ensure_ascii=False, indent=1)
+
+        lines = [f"启动分析 (已写入 {self.trace_path})"]
+        for category, phases in summary['phases'].items():
+            for name, duration in sorted(phases.items(), key=lambda item: -item[1]):
+                lines.append(f"  [{category}] {name}: {duration:.1f} ms")
+        for name, value in summary['marks'].items():
+            lines.append(f"  {name}: {value:.1f} ms")
+        logger.info("\n".join(lines))
+        if summary.get('over_budget'):
+            logger.warning("首屏耗时 %.1f ms 超出预算 %.1f ms", summary['marks']['first_update'], self.budget_ms)
+
+
+def profiler_from_env() -> StartupProfiler:
+    """根据环境变量创建启动分析器"""
+    value = os.environ.get(PROFILE_ENV, "").strip()
+    if not value or value == "0":
+        return StartupProfiler()
+    trace_path = DEFAULT_TRACE_PATH if value == "1" else value
+    budget = os.environ.get(BUDGET_ENV)
+    return StartupProfiler(trace_path, float(budget) if budget else None)
+
+
+# 进程内共享的启动分析器
+profiler = profiler_from_env()
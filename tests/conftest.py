@@ -0,0 +1,5 @@
+"""测试时从仓库根目录导入 database / importer 等模块"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,25 @@
+"""列表图标: 预合成的话筒SVG资源与生成代码一致"""
+import os
+
+import pytest
+
+import Flet_app
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets')
+
+
+@pytest.mark.parametrize("is_outgoing, color", [
+    (True, Flet_app.OUTGOING_COLOR),
+    (False, Flet_app.INCOMING_COLOR),
+])
+def test_phone_icon_asset_matches_svg(is_outgoing, color):
+    # 修改话筒路径/箭头/颜色后需用 phone_icon_svg() 重新生成 assets 中的文件
+    path = os.path.join(ASSETS_DIR, Flet_app.PHONE_ICON_ASSETS[is_outgoing].lstrip('/'))
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == Flet_app.phone_icon_svg(color, is_outgoing)
+
+
+def test_phone_icon_references_asset():
+    icon = Flet_app.create_phone_icon(size=16, is_outgoing=0)
+    assert icon.src == Flet_app.PHONE_ICON_ASSETS[False]
+    assert icon.src_base64 is None
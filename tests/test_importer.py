@@ -0,0 +1,79 @@
+"""详单导入: 日期解析、CSV 编码和中途出错"""
+import csv
+from datetime import datetime
+
+import pytest
+
+from database import CallLogDatabase
+from importer import BillImportError, detect_csv_encoding, import_bill, parse_call_date
+
+BILL_HEADER = "对方号码,对方号码归属地,日期,接通时间,通话时长,通话费用\n"
+BILL_ROW = "13800000000,福建福州,12.10,08:05,65,0.30\n"
+
+
+@pytest.mark.parametrize("value, expected", [
+    # XLSX 数字单元格: 12.10 读出来是浮点数 12.1, 不能被当成 12月01日
+    (12.1, (2025, "12.10")),
+    (12.01, (2025, "12.01")),
+    (1.05, (2025, "01.05")),
+    (12.3, (2025, "12.30")),
+])
+def test_parse_call_date_numeric_cell(value, expected):
+    assert parse_call_date(value, 2025) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("12.10", (2025, "12.10")),
+    (" 12.1 ", (2025, "12.01")),
+    ("2024.02.29", (2024, "02.29")),
+    ("2024-12-10", (2024, "12.10")),
+    ("12-10", (2025, "12.10")),
+    ("2024/3/7", (2024, "03.07")),
+    ("3/7", (2025, "03.07")),
+])
+def test_parse_call_date_text(value, expected):
+    assert parse_call_date(value, 2025) == expected
+
+
+def test_parse_call_date_datetime_cell():
+    assert parse_call_date(datetime(2024, 12, 10, 8, 30), 2025) == (2024, "12.10")
+
+
+@pytest.mark.parametrize("value", [12, 13.01, 12.32, "12.32", "2025/13/01", "abc", ""])
+def test_parse_call_date_invalid(value):
+    with pytest.raises(BillImportError):
+        parse_call_date(value, 2025)
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = CallLogDatabase(str(tmp_path / 'calls.db'))
+    yield db
+    db.close()
+
+
+@pytest.mark.parametrize("encoding, expected", [
+    ('utf-8', 'utf-8-sig'),
+    ('utf-8-sig', 'utf-8-sig'),
+    ('gbk', 'gb18030'),
+    ('gb18030', 'gb18030'),
+])
+def test_import_csv_encoding(tmp_path, db, encoding, expected):
+    path = tmp_path / 'bill.csv'
+    path.write_text(BILL_HEADER + BILL_ROW * 3, encoding=encoding)
+    assert detect_csv_encoding(str(path)) == expected
+    result = import_bill(db, str(path), default_year=2025)
+    assert (result.imported, result.skipped) == (3, 0)
+    assert {log['location'] for log in db.get_logs_by_month(2025, 12)} == {'福建福州'}
+
+
+def test_import_error_keeps_committed_batches(tmp_path, db):
+    # 第 5 行字段超过 csv 模块的长度限制, 此前提交的两个批次保留, 进度回调给出已导入条数
+    path = tmp_path / 'bill.csv'
+    oversized = "1" * (csv.field_size_limit() + 1)
+    path.write_text(BILL_HEADER + BILL_ROW * 4 + f"{oversized},福建福州,12.10,08:05,65,0.30\n", encoding='utf-8')
+    progress = []
+    with pytest.raises(csv.Error):
+        import_bill(db, str(path), default_year=2025, progress=progress.append, batch_size=2)
+    assert progress == [2, 4]
+    assert db.get_stats(2025, 12)['call_count'] == 4
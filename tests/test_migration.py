@@ -0,0 +1,202 @@
+"""数据库迁移: v7 -> 当前版本 (call_at 回填及时间索引)"""
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from database import CALL_AT_BACKFILL_KEY, CALL_AT_EPOCH, SCHEMA_VERSION, CallLogDatabase
+
+# v7 的表结构 (不含可选的 FTS5 全文索引, 与本次迁移无关)
+V7_SCHEMA = '''
+    CREATE TABLE call_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        phone_number TEXT NOT NULL,
+        call_type TEXT DEFAULT '高清语音',
+        location TEXT DEFAULT '福建福州',
+        connect_time TEXT NOT NULL,
+        call_duration INTEGER DEFAULT 0,
+        billing_minutes INTEGER DEFAULT 0,
+        call_fee REAL DEFAULT 0.0,
+        call_date TEXT NOT NULL,
+        call_time TEXT NOT NULL,
+        is_hd_voice INTEGER DEFAULT 1,
+        is_outgoing INTEGER DEFAULT 1,
+        weekday TEXT,
+        year INTEGER,
+        deleted_batch INTEGER
+    );
+    CREATE TABLE config (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+    CREATE TABLE call_stats (
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        call_count INTEGER NOT NULL DEFAULT 0,
+        total_fee REAL NOT NULL DEFAULT 0.0,
+        total_duration INTEGER NOT NULL DEFAULT 0,
+        total_billing_minutes INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (year, month)
+    );
+    CREATE TABLE call_day_stats (
+        year INTEGER NOT NULL,
+        call_date TEXT NOT NULL,
+        call_count INTEGER NOT NULL DEFAULT 0,
+        total_fee REAL NOT NULL DEFAULT 0.0,
+        PRIMARY KEY (year, call_date)
+    ) WITHOUT ROWID;
+    CREATE TABLE undo_journal (
+        batch INTEGER PRIMARY KEY AUTOINCREMENT,
+        action TEXT NOT NULL,
+        row_count INTEGER NOT NULL,
+        created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX idx_call_logs_time ON call_logs (year, call_date, connect_time);
+    CREATE INDEX idx_call_logs_direction_time ON call_logs (is_outgoing, year, call_date, connect_time);
+    CREATE INDEX idx_call_logs_fee ON call_logs (year, call_fee, call_date, connect_time);
+    CREATE INDEX idx_call_logs_deleted ON call_logs (deleted_batch) WHERE deleted_batch IS NOT NULL;
+    INSERT INTO undo_journal (action, row_count) VALUES ('delete', 1);
+    PRAGMA user_version = 7;
+'''
+
+
+def seconds(*moment) -> int:
+    return int((datetime(*moment) - CALL_AT_EPOCH).total_seconds())
+
+
+# (年份, 日期, 接通时间, 删除批次) -> 回填后的 call_at; 格式错误的记录保留, call_at 为 NULL
+V7_LOGS = [
+    ((2025, '12.10', '08:05:09', None), seconds(2025, 12, 10, 8, 5, 9)),
+    ((2025, '12.09', '23:59', None), seconds(2025, 12, 9, 23, 59)),
+    ((2024, '02.29', '10:00', None), seconds(2024, 2, 29, 10, 0)),
+    ((2025, '12.08', '07:00', 1), seconds(2025, 12, 8, 7, 0)),
+    ((2025, '02.29', '10:00', None), None),
+    ((2025, '12.1x', '08:00', None), None),
+    ((2025, '12.11', '25:00', None), None),
+    ((2025, '', '08:00', None), None),
+    ((2025, '12.11', '', None), None),
+]
+
+NEW_INDEXES = {
+    'idx_call_logs_time': ['call_at'],
+    'idx_call_logs_direction_time': ['is_outgoing', 'call_at'],
+    'idx_call_logs_fee': ['year', 'call_fee', 'call_at'],
+}
+
+
+@pytest.fixture
+def v7_path(tmp_path):
+    path = str(tmp_path / 'v7.db')
+    conn = sqlite3.connect(path)
+    conn.executescript(V7_SCHEMA)
+    with conn:
+        conn.executemany(
+            "INSERT INTO call_logs (phone_number, connect_time, call_date, call_time, year, deleted_batch) "
+            "VALUES ('13800000000', ?, ?, ?, ?, ?)",
+            [(time, date, time, year, batch) for (year, date, time, batch), _ in V7_LOGS]
+        )
+    conn.close()
+    return path
+
+
+def call_at_by_id(db) -> dict:
+    return dict(db.conn.execute("SELECT id, call_at FROM call_logs").fetchall())
+
+
+def index_columns(db) -> dict:
+    return {
+        name: [row['name'] for row in db.conn.execute(f"PRAGMA index_info({name})")]
+        for name in NEW_INDEXES
+    }
+
+
+def expected_call_at() -> dict:
+    return {log_id: call_at for log_id, (_, call_at) in enumerate(V7_LOGS, start=1)}
+
+
+def test_migrate_v7_backfills_call_at(v7_path):
+    db = CallLogDatabase(v7_path)
+    assert db.conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert call_at_by_id(db) == expected_call_at()
+    assert index_columns(db) == NEW_INDEXES
+    assert db.get_config(CALL_AT_BACKFILL_KEY) is None
+    # 时间排序走 call_at: 格式错误 (call_at 为 NULL) 和已删除的记录不出现在月份中
+    assert [log['id'] for log in db.get_logs_page(year=2025, month=12)] == [1, 2]
+    db.close()
+
+
+def test_migrate_v7_twice(v7_path):
+    CallLogDatabase(v7_path).close()
+    db = CallLogDatabase(v7_path)
+    db.backfill_call_at()
+    assert db.conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert call_at_by_id(db) == expected_call_at()
+    assert index_columns(db) == NEW_INDEXES
+    db.close()
+
+
+def test_backfill_resumes_from_progress(v7_path):
+    db = CallLogDatabase(v7_path)
+    # 模拟在回填完 id <= 2 后中断: 已回填的部分不应再被改写
+    with db.transaction():
+        for name in NEW_INDEXES:
+            db.conn.execute(f"DROP INDEX {name}")
+        db.conn.execute("UPDATE call_logs SET call_at = CASE WHEN id <= 2 THEN -1 END")
+        db.set_config(CALL_AT_BACKFILL_KEY, '2')
+    db.backfill_call_at(batch_size=3)
+    assert call_at_by_id(db) == {**expected_call_at(), 1: -1, 2: -1}
+    assert index_columns(db) == NEW_INDEXES
+    assert db.get_config(CALL_AT_BACKFILL_KEY) is None
+    db.close()
+
+
+def test_failed_upgrade_rolls_back(v7_path, monkeypatch):
+    def fail(self):
+        raise sqlite3.OperationalError("disk I/O error")
+    monkeypatch.setattr(CallLogDatabase, 'rebuild_rollups', fail)
+    with pytest.raises(sqlite3.OperationalError):
+        CallLogDatabase(v7_path)
+    # 升级失败时加列、删索引等结构变更一并回滚, 仍是完整的 v7 数据库
+    conn = sqlite3.connect(v7_path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 7
+    assert 'call_at' not in {row[1] for row in conn.execute("PRAGMA table_info(call_logs)")}
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'idx_call_logs_time'").fetchone()[0] == 1
+    conn.close()
+
+    monkeypatch.undo()
+    db = CallLogDatabase(v7_path)
+    assert db.conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert call_at_by_id(db) == expected_call_at()
+    db.close()
+
+
+def test_upgrade_with_call_at_already_added(v7_path):
+    # 旧版本升级中途失败时可能已经加了 call_at 列, 但版本号仍是 7
+    conn = sqlite3.connect(v7_path)
+    conn.execute("ALTER TABLE call_logs ADD COLUMN call_at INTEGER")
+    conn.close()
+    db = CallLogDatabase(v7_path)
+    assert call_at_by_id(db) == expected_call_at()
+    assert index_columns(db) == NEW_INDEXES
+    db.close()
+
+
+def test_summaries_skip_unparseable_logs(v7_path, caplog):
+    # 汇总与列表一致: 格式错误 (call_at 为 NULL) 的记录不计入月汇总和日历
+    with caplog.at_level('WARNING', logger='call_log.database'):
+        db = CallLogDatabase(v7_path)
+    assert "5 条记录的日期/时间无法解析" in caplog.text
+    assert db.get_stats()['call_count'] == 3
+    assert db.get_stats(2025, 12)['call_count'] == 2
+    assert set(db.get_day_stats(2025, 12)) == {'12.09', '12.10'}
+    db.close()
+
+
+def test_upgrade_v9_rebuilds_summaries(v7_path):
+    # v9 的汇总表计入了格式错误的记录, 升级到 v10 时重建
+    db = CallLogDatabase(v7_path)
+    with db.transaction():
+        db.conn.execute("INSERT INTO call_day_stats (year, call_date, call_count, total_fee) VALUES (2025, '12.11', 2, 0)")
+        db.conn.execute("PRAGMA user_version = 9")
+    db.close()
+    db = CallLogDatabase(v7_path)
+    assert db.conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert set(db.get_day_stats(2025, 12)) == {'12.09', '12.10'}
+    db.close()
@@ -0,0 +1,133 @@
+"""软删除: 撤销、撤销日志长度和后台整理后的汇总表"""
+import pytest
+
+from database import UNDO_JOURNAL_SIZE, UNDO_WINDOW, CallLogDatabase
+
+LOGS = [
+    {'phone_number': '13800000001', 'call_date': '12.01', 'connect_time': '08:00', 'call_time': '08:00',
+     'call_duration': 65, 'billing_minutes': 2, 'call_fee': 0.3, 'year': 2025},
+    {'phone_number': '13800000002', 'call_date': '12.01', 'connect_time': '09:30', 'call_time': '09:30',
+     'call_duration': 30, 'billing_minutes': 1, 'call_fee': 0.15, 'year': 2025},
+    {'phone_number': '13800000003', 'call_date': '12.02', 'connect_time': '20:15', 'call_time': '20:15',
+     'call_duration': 0, 'billing_minutes': 0, 'call_fee': 0.0, 'year': 2025},
+]
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = CallLogDatabase(str(tmp_path / 'calls.db'))
+    db.add_call_logs_bulk(LOGS * (UNDO_JOURNAL_SIZE // len(LOGS) + 2))
+    yield db
+    db.close()
+
+
+def expire_undo_window(db):
+    """把撤销日志中的批次都改为撤销时长之前写入的"""
+    with db.transaction():
+        db.conn.execute(
+            "UPDATE undo_journal SET created_at = datetime(created_at, ?)", (f"-{UNDO_WINDOW + 1} seconds",)
+        )
+
+
+def stats_snapshot(db) -> tuple:
+    return db.get_stats(), db.get_stats(2025, 12), db.get_day_stats(2025, 12)
+
+
+def assert_stats_match_rebuild(db):
+    """增量维护的汇总表应与按现有记录重新计算的结果一致"""
+    snapshot = stats_snapshot(db)
+    with db.transaction():
+        db.rebuild_stats()
+        db.rebuild_day_stats()
+    assert snapshot == stats_snapshot(db)
+
+
+def test_undo_delete(db):
+    before = stats_snapshot(db)
+    batch = db.delete_call_log(1)
+    assert db.get_log(1) is None
+    assert db.get_stats(2025, 12)['call_count'] == before[1]['call_count'] - 1
+    assert_stats_match_rebuild(db)
+
+    assert db.undo(batch) == 1
+    assert db.get_log(1)['phone_number'] == LOGS[0]['phone_number']
+    assert stats_snapshot(db) == before
+    # 同一批次只能撤销一次
+    assert db.undo(batch) == 0
+
+
+def test_undo_clear(db):
+    before = stats_snapshot(db)
+    batch = db.clear_all_logs()
+    assert db.get_stats()['call_count'] == 0
+    assert db.get_day_stats(2025, 12) == {}
+    assert db.clear_all_logs() is None
+
+    assert db.undo(batch) == before[0]['call_count']
+    assert stats_snapshot(db) == before
+
+
+def test_undo_journal_keeps_latest_batches(db):
+    batches = [db.delete_call_log(log_id) for log_id in range(1, UNDO_JOURNAL_SIZE + 2)]
+    journal = [row['batch'] for row in db.conn.execute("SELECT batch FROM undo_journal ORDER BY batch")]
+    assert journal == batches[1:]
+    # 最早的批次已移出撤销日志, 不能再撤销
+    assert db.undo(batches[0]) == 0
+    assert db.get_log(1) is None
+    assert db.undo(batches[-1]) == 1
+
+
+def test_compact_purges_only_expired_batches(db):
+    total = db.get_stats()['call_count']
+    batches = [db.delete_call_log(log_id) for log_id in range(1, UNDO_JOURNAL_SIZE + 2)]
+    before = stats_snapshot(db)
+
+    assert db.compact() == 1
+    assert db.conn.execute("SELECT COUNT(*) FROM call_logs WHERE id = 1").fetchone()[0] == 0
+    assert db.conn.execute("SELECT COUNT(*) FROM call_logs").fetchone()[0] == total - 1
+    assert stats_snapshot(db) == before
+    assert_stats_match_rebuild(db)
+    assert db.compact() == 0
+
+    # 仍在撤销日志中的批次在整理后可以撤销
+    assert db.undo(batches[1]) == 1
+    assert db.get_log(2) is not None
+    assert_stats_match_rebuild(db)
+
+
+def test_undo_after_window(db):
+    batch = db.delete_call_log(1)
+    expire_undo_window(db)
+    assert db.undo(batch) == 0
+    assert db.get_log(1) is None
+
+
+def test_compact_purges_clear_after_undo_window(db):
+    batch = db.clear_all_logs()
+    db.add_call_log(LOGS[0])
+    # 撤销时长内整理不删除, 仍可撤销
+    assert db.compact() == 0
+
+    expire_undo_window(db)
+    total = db.conn.execute("SELECT COUNT(*) FROM call_logs WHERE deleted_batch IS NOT NULL").fetchone()[0]
+    assert db.compact() == total
+    assert db.conn.execute("SELECT COUNT(*) FROM call_logs").fetchone()[0] == 1
+    assert db.conn.execute("SELECT COUNT(*) FROM undo_journal").fetchone()[0] == 0
+    assert db.undo(batch) == 0
+    assert db.get_stats()['call_count'] == 1
+    assert_stats_match_rebuild(db)
+
+
+def test_unparseable_log_not_counted(db):
+    before = stats_snapshot(db)
+    log_id = db.add_call_log({**LOGS[0], 'connect_time': '25:00'})
+    assert stats_snapshot(db) == before
+    # 改成有效时间后计入汇总, 删除/撤销同样保持一致
+    db.update_call_log(log_id, {'connect_time': '08:00'})
+    assert db.get_stats(2025, 12)['call_count'] == before[1]['call_count'] + 1
+    db.update_call_log(log_id, {'connect_time': '25:00'})
+    assert stats_snapshot(db) == before
+    batch = db.delete_call_log(log_id)
+    assert db.undo(batch) == 1
+    assert stats_snapshot(db) == before
+    assert_stats_match_rebuild(db)